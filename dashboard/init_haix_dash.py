@@ -11,19 +11,23 @@ import plotly.graph_objs as go
 import numpy as np
 import os
 import ast
-from utils import variables as var, dash_util as util, language_utils
+from utils import variables as var, dash_util as util, language_utils, trajectory_lod
 from utils.database import database as db
 from .layout import init_layout
 import pathlib
 from flask.helpers import get_root_path
 
 import logging
-import geopy.distance
 
 ## Local imports:
 from .sonar_ui import get_sonar_section
 from .sonar_callbacks import register_sonar_callbacks
 
+# milliseconds between two currentTime updates of a DashPlayer
+VIDEO_TIME_INTERVAL = 5000
+# playback seconds of one image, video_util encodes the images with 20 fps
+VIDEO_SAMPLE_SECONDS = 1 / 20
+
 
 def init_haix_dash(dash_app):
     # create dash layout
@@ -39,6 +43,9 @@ def init_haix_dash(dash_app):
         dcc.Location(id='url', refresh=True),
         html.Div(id='page-content', children=[
             dcc.Store(id='click-storage'),
+            dcc.Store(id='map-detail-level', data=trajectory_lod.level_for_zoom(13)),
+            dcc.Store(id='map-overlays'),
+            dcc.Store(id='ir-seek-time'),
             dbc.Row([
                 dbc.Col([
                     dcc.Dropdown(date_choices, id="dropdown-choice", placeholder="Select dates", multi=True),
@@ -75,6 +82,9 @@ def init_callbacks(app):
 
         content = html.Div(children=[
                 dcc.Store(id='click-storage'),
+                dcc.Store(id='map-detail-level', data=trajectory_lod.level_for_zoom(13)),
+                dcc.Store(id='map-overlays'),
+                dcc.Store(id='ir-seek-time'),
                 dbc.Row([
                     dbc.Col([
                         dcc.Dropdown(date_choices, id="dropdown-choice", placeholder="Select dates", multi=True),
@@ -116,12 +126,28 @@ def init_callbacks(app):
         return util.format_dates()
 
 
+    @app.callback(
+        Output(component_id='map-detail-level', component_property='data'),
+        Input(component_id='map-viz', component_property='relayoutData'),
+        State(component_id='map-detail-level', component_property='data')
+    )
+    def update_detail_level(relayoutData, level):
+        # only a zoom into another level of detail redraws the map, panning and small zoom steps do not
+        if not relayoutData or 'mapbox.zoom' not in relayoutData:
+            raise PreventUpdate
+        new_level = trajectory_lod.level_for_zoom(relayoutData['mapbox.zoom'])
+        if new_level == level:
+            raise PreventUpdate
+        return new_level
+
     @app.callback(
         Output(component_id='map-viz', component_property='figure'),
+        Output(component_id='map-overlays', component_property='data'),
         Input(component_id='dropdown-choice', component_property='value'),
-        Input(component_id='choices', component_property='value')
+        Input(component_id='choices', component_property='value'),
+        Input(component_id='map-detail-level', component_property='data')
     )
-    def update_graph(days_chosen, type_chosen):
+    def update_graph(days_chosen, type_chosen, detail_level):
         days_chosen = util.clean_dates(days_chosen)
 
         df = db.open_table(var.SCHEMA, var.AREA, var.AREA_COLS)
@@ -131,9 +157,7 @@ def init_callbacks(app):
         df = util.add_has_images_col(df)
         df['idx'] = df['idx'].astype(str)
 
-        db.convert_to_geojson_file(var.SCHEMA, var.GEO, var.GEO_FILE)
-        with open(var.GEO_FILE, 'r') as file:
-            geojson = json.load(file)
+        geojson = db.get_geojson_dict(var.SCHEMA, var.GEO)
 
         fig = px.choropleth_mapbox(
             df, geojson=geojson, color="type",
@@ -148,8 +172,10 @@ def init_callbacks(app):
                 var.neutral: "grey"},
             range_color=[0, 6500],
             custom_data=['type', 'idx', 'date', 'description', 'has_images'])
+        # keeps the zoom and center of the user when the figure is rebuilt
         fig.update_layout(
-            margin={"r": 0, "t": 0, "l": 0, "b": 0})
+            margin={"r": 0, "t": 0, "l": 0, "b": 0},
+            uirevision='map')
         fig.update_traces(hovertemplate='<b>type</b>: %{customdata[0]}<br>' +
                                         '<b>id</b>: %{customdata[1]}<br>' +
                                         '<b>date</b>: %{customdata[2]}<br>' +
@@ -160,13 +186,14 @@ def init_callbacks(app):
             days = tuple([d.strftime('%Y-%m-%d') for d in days_chosen])
 
             if len(days) != 0:
-                trajectory = db.open_table(var.SCHEMA, var.traj, var.TRAJ_COLS, filter=('date', days))
-                trajectory['date'] = pd.to_datetime(trajectory['date'])
-                trajec = trajectory.loc[trajectory['date'].isin(days_chosen)]
                 for day_chosen in days:
                     dataname = var.maschsee + str(day_chosen)
 
                     try:
+                        # simplified to the current zoom, shared through the cache so it is only read here
+                        trajec = trajectory_lod.get_day(day_chosen, detail_level)
+                        if len(trajec) == 0:
+                            continue
                         lats = trajec["latitude"]
                         lons = trajec["longitude"]
 
@@ -175,8 +202,7 @@ def init_callbacks(app):
                         else:
                             has_video = False
 
-                        trajec["mowed_grass"].fillna(value=0, inplace=True)
-                        mow_amount = trajec["mowed_grass"].to_numpy()
+                        mow_amount = trajec["mowed_grass"].fillna(value=0).to_numpy(dtype=float)
 
                         customdataarray = np.full((len(lats), 3), [var.seekuh, day_chosen, has_video])
                         customdataarray = np.concatenate((customdataarray, trajec['timestamp'].values.reshape(-1, 1)), axis=1)
@@ -200,28 +226,19 @@ def init_callbacks(app):
                         print("No data for that day")
 
         if var.PATH_PLANNING in type_chosen:
+            path_version = db.table_version(var.SCHEMA, var.PATH)
             path = db.open_table(var.SCHEMA, var.PATH, var.PATH_COLS)
             path['date'] = pd.to_datetime(path['date'])
             path = path[path['date'].isin(days_chosen)]
+            path = path.assign(order=path['idx'].str.split('-').str[-1].astype(int)).sort_values(['path_id', 'order'])
+            lengths = util.path_lengths(path, path_version)
 
-            for x in path['path_id'].unique():
-                subpath = path.loc[path['path_id'] == x]
+            for x, subpath in path.groupby('path_id', sort=False):
                 date = subpath['date'].values[0]
-                data = np.full((len(subpath['lat']), 3), ['path', str(x), np.datetime_as_string(date, unit='D')])
-                unique_ids = [[str(n)] for n in subpath.idx]
+                data = np.full((len(subpath), 3), ['path', str(x), np.datetime_as_string(date, unit='D')])
+                unique_ids = subpath['idx'].astype(str).values.reshape(-1, 1)
                 data = np.concatenate((data, unique_ids), axis=1)
-
-                subpath['idx'] = subpath['idx'].str.split('-').str[-1].astype(int)
-                subpath.sort_values('idx', inplace=True)
-
-                dist = 0
-                for x in range(len(subpath) - 1):
-                    #logging.info(subpath.iloc[x]['lat'])
-                    #logging.info(subpath.iloc[x]['lon'])
-                    dist += geopy.distance.geodesic([subpath.iloc[x]['lat'], subpath.iloc[x]['lon']], [subpath.iloc[x + 1]['lat'], subpath.iloc[x + 1]['lon']]).km
-
-                data = np.insert(data, data.shape[1], dist, axis=1)
-
+                data = np.insert(data, data.shape[1], lengths[x], axis=1)
 
                 fig.add_scattermapbox(
                     lat=subpath.lat,
@@ -240,19 +257,20 @@ def init_callbacks(app):
             lon=[],
             mode='lines'
         )
-        
-        return fig
+        overlays = util.add_overlay_traces(fig)
+
+        return fig, overlays
     
     @app.callback(
         Output(component_id='click-info-output', component_property='children', allow_duplicate=True),
         Output(component_id='click-storage', component_property='data'),
         Output(component_id='map-viz', component_property='figure', allow_duplicate=True),
         Input(component_id='map-viz', component_property='clickData'),
-        State(component_id='map-viz', component_property='figure'),
+        State(component_id='map-overlays', component_property='data'),
         State(component_id='click-info-output', component_property='children'),
         prevent_initial_call=True
     )
-    def show_information(clickData, fig, child):
+    def show_information(clickData, overlays, child):
         if clickData is not None:
             if 'customdata' in clickData['points'][0].keys():
                 map_info = clickData['points'][0]["customdata"]
@@ -267,7 +285,7 @@ def init_callbacks(app):
 
                     if informations != 0:
                         area_string = 'Area: (' + str(informations[1]) + ', ' + str(informations[2]) + ', ' + str(
-                            informations[3]) + ', ' + str(informations[4]) + ')'
+                            informations[3]) + ', ' + str(informations[4]) + ') ' + util.get_areas_at(lat, lon)
 
                         if child is not None:
                             # children = child['props']['children']
@@ -298,14 +316,22 @@ def init_callbacks(app):
                             ])
                             block.children.append(video)
 
-                        figure = go.Figure(fig)
-                        figure = util.clear_map(figure)
+                        if overlays is not None:
+                            # marks where the video segment of the clicked point starts and stops
+                            figure = util.set_start_stop(dash.Patch(), overlays,
+                                                         (informations[1], informations[2]),
+                                                         (informations[3], informations[4]))
                         data = {
                             'lat': lat,
                             'lon': lon
                         }
                     else:
-                        block = html.Div([html.P('Coordinates: (' + str(lat) + ', ' + str(lon) + ')')])
+                        block = html.Div([
+                            html.P('Coordinates: (' + str(lat) + ', ' + str(lon) + ')'),
+                            html.P(util.get_areas_at(lat, lon))
+                        ])
+                        if overlays is not None:
+                            figure = util.clear_start_stop(dash.Patch(), overlays)
                         data = {
                             'lat': lat,
                             'lon': lon
@@ -313,9 +339,7 @@ def init_callbacks(app):
                     return block, json.dumps(data), figure
                 elif map_info[0] == var.AVOID or map_info[0] == var.INTEREST:
                     # show area info
-                    db.convert_to_geojson_file(var.SCHEMA, var.GEO, var.GEO_FILE)
-                    with open(var.GEO_FILE, 'r') as file:
-                        geojson = json.load(file)
+                    geojson = db.get_geojson_dict(var.SCHEMA, var.GEO)
                     id = clickData['points'][0]['location']
                     for area in geojson['features']:
                         if int(id) == area['id']:
@@ -450,10 +474,11 @@ def init_callbacks(app):
         # videoname = "movie" + str(information[0]) + ".mp4"
         # videoname = "color_full.mp4"
 
-        video_path_rgb = url_for('static', filename='video/' + var.maschsee + map_info[1] + '/' + var.VIDEO_FILE_NAME_RGB)
+        # segmented HLS streams only fetch the few seconds around a seek, the mp4 files are the fallback
+        video_path_rgb = util.get_video_url(map_info[1], var.VIDEO_FILE_NAME_RGB, var.VIDEO_HLS_NAME_RGB)
         # videoname_ir = videoname.replace('.mp4', '_infra.mp4')
         # videoname_ir = "infra1_full.mp4"
-        video_path_ir = url_for('static', filename='video/' + var.maschsee + map_info[1] + '/' + var.VIDEO_FILE_NAME_IR)
+        video_path_ir = util.get_video_url(map_info[1], var.VIDEO_FILE_NAME_IR, var.VIDEO_HLS_NAME_IR)
 
         video = None
 
@@ -478,7 +503,7 @@ def init_callbacks(app):
                     url=video_path,
                     width="100%",
                     height="auto",
-                    intervalCurrentTime=5000,
+                    intervalCurrentTime=VIDEO_TIME_INTERVAL,
                     seekTo=video_time
                 )
             ])
@@ -493,7 +518,7 @@ def init_callbacks(app):
                             controls=True,
                             width="100%",
                             height="auto",
-                            intervalCurrentTime=5000,
+                            intervalCurrentTime=VIDEO_TIME_INTERVAL,
                             seekTo=timeColor
                         ),
                     ]),
@@ -504,7 +529,7 @@ def init_callbacks(app):
                             controls=True,
                             width="100%",
                             height="auto",
-                            intervalCurrentTime=5000,
+                            intervalCurrentTime=VIDEO_TIME_INTERVAL,
                             seekTo=timeInfra
                         ),
                     ]),
@@ -570,16 +595,37 @@ def init_callbacks(app):
 
         return curr_rgb_time, curr_ir_time
 
+    @app.callback(
+        Output(component_id='secondary_player', component_property='seekTo', allow_duplicate=True),
+        Output(component_id='ir-seek-time', component_property='data'),
+        Input(component_id='main_player', component_property='currentTime'),
+        State(component_id='map-viz', component_property='clickData'),
+        State(component_id='ir-seek-time', component_property='data'),
+        prevent_initial_call=True
+    )
+    def follow_main_video(current_rgb_time, clickData, last_ir_time):
+        # keeps the IR video in sync during playback, only the fresh RGB time is used since the
+        # IR player reports its time on its own timer, the alignment lookup is a binary search
+        if current_rgb_time is None or clickData is None:
+            raise PreventUpdate
+        if 'customdata' not in clickData['points'][0].keys() or clickData['points'][0]["customdata"][0] != var.seekuh:
+            raise PreventUpdate
+
+        ir_time = util.get_ir_time_by_rgb_time(current_rgb_time, clickData['points'][0]["customdata"][1])
+        if ir_time == 0 or (last_ir_time is not None and abs(ir_time - last_ir_time) <= VIDEO_SAMPLE_SECONDS):
+            raise PreventUpdate
+        return ir_time, ir_time
+
     @app.callback(
         Output(component_id='map-viz', component_property='figure', allow_duplicate=True),
         Input(component_id='main_player', component_property='currentTime'),
         Input(component_id='map-viz', component_property='clickData'),
         Input(component_id='video-choice', component_property='value'),
-        State(component_id='map-viz', component_property='figure'),
+        State(component_id='map-overlays', component_property='data'),
         prevent_initial_call=True
     )
-    def update_map_video_time(currentTime, clickData, videoModeChosen, fig):
-        if currentTime is None or currentTime < 1 or clickData is None:
+    def update_map_video_time(currentTime, clickData, videoModeChosen, overlays):
+        if currentTime is None or currentTime < 1 or clickData is None or overlays is None:
             raise PreventUpdate
 
         date = clickData['points'][0]["customdata"][1]
@@ -592,11 +638,12 @@ def init_callbacks(app):
         else:
             video_name = var.VIDEO_TIME_RGB_FILE_NAME
 
-        figure = go.Figure(fig)
-        figure = util.clear_boat(figure)
-        figure = util.add_boat_positions(figure, round(currentTime, 1), date, video_name)
+        position = util.get_boat_position(round(currentTime, 1), date, video_name)
+        if position is None:
+            raise PreventUpdate
 
-        return figure
+        # only the boat trace is sent to the browser, not the whole map
+        return util.move_boat(dash.Patch(), overlays, position[0], position[1])
     
     register_sonar_callbacks(app)
 
@@ -4,6 +4,7 @@ import secrets
 from flask import Flask, session
 from flask_debugtoolbar import DebugToolbarExtension
 from dashboard import dash_init
+from utils.database import listener
 
 def init_app():
     """Construct core Flask application with embedded Dash app."""
@@ -16,6 +17,8 @@ def init_app():
     with server.app_context(), server.test_request_context():
         import routes.routes
         server = dash_init(server)
+        # keeps the caches of this process in line with writes of other worker processes
+        listener.start_listener()
         return server
 
 app = init_app()
@@ -59,30 +59,26 @@ def add_single_new_area_to_db(req, var_lang):
         geom_str = db.convert_to_geostr(var.Geometry.POLYGON.name, mypolygon_coordinates)
         polygon_coordinates.append(geom_str)
 
-    for polygon in polygon_coordinates:
-        id_data = db.get_max_id(var.SCHEMA, var.AREA) + 1
-
-        image_files = req.files.getlist("file")
+    # the ids are needed for the image names before the rows are written
+    area_ids = db.reserve_ids(var.SCHEMA, var.AREA, len(polygon_coordinates))
+    image_files = req.files.getlist("file")
 
+    areas = []
+    for id_data, polygon in zip(area_ids, polygon_coordinates):
         image_names = util.format_image_names(image_files, id_data)
         area_values = {
-            'idx': str(id_data),
             'type': typeofarea,
             'date': date,
             'description': description,
             'image_path': image_names if image_names else None
         }
-        db.add_row(var.SCHEMA, var.AREA, area_values)
+        areas.append((area_values, polygon))
 
-        for file in image_files:
-            if file.filename != '':
-                file.save(var.IMG_PATH + file.filename)
+    db.add_areas_with_geometries(var.SCHEMA, var.AREA, var.GEO, areas, ids=area_ids)
 
-        geom_values = {
-            'idx': str(id_data),
-            'geom': polygon
-        }
-        db.add_row(var.SCHEMA, var.GEO, geom_values)
+    for file in image_files:
+        if file.filename != '':
+            file.save(var.IMG_PATH + file.filename)
 
     return _render_template_helper(var_lang, submit_response="Successfully added new area", aoi=False)
 
@@ -3,16 +3,18 @@ import ast
 import json
 from ast import literal_eval
 from datetime import datetime
+from decimal import Decimal
 import logging
 import numpy
 
 import pandas as pd
+import psycopg2
 import requests
 from flask import render_template, request, current_app as app, session, jsonify
 
 from utils import route_util as util, generate_path_script
 from utils import variables as var, dash_util as dutil, language_utils
-from utils.database import database as db
+from utils.database import database as db, metrics, vector_tiles
 from .new_area import add_single_new_area_to_db, visualize_areas_of_interest, save_date_file, get_possible_satellite_fly_overs
 
 DATES_FILE_NAME_PREFIX = "./static/data/dates_of_fly_overs_for-"
@@ -21,10 +23,12 @@ DEFAULT_DATES_FILE_NAME = DATES_FILE_NAME_PREFIX + "Maschsee,Hannover,Germany"
 TRAJ_OBJ = {
     'editable_cols': [],
     'hidden_cols': ['date'],
-    'type': var.TRAJ,
-    'max_rows': 100,
-    'filter': 0
+    'type': var.TRAJ
 }
+# rows per page of the tables view, "show more" loads the next page from table_page()
+PAGE_SIZE = 100
+# upper limit of rows returned by one request to the table page api
+MAX_PAGE_SIZE = 1000
 
 
 @app.route("/newarea", methods=["GET"])
@@ -105,27 +109,21 @@ def new_area_save_aois():
 
     dieliste = literal_eval(request.form.getlist('aois_ts')[0])
 
+    areas = []
     for element in dieliste:
-        id_data = db.get_max_id(var.SCHEMA, var.AREA) + 1
-
         element.append(element[0])
 
         polygon = db.convert_to_geostr(var.Geometry.POLYGON.name, element)
 
         area_values = {
-            'idx': str(id_data),
             'type': "interest",
             'date': date[0],
             'description': "Automatic generated AOI from satellite pictures",
             'image_path': None
         }
-        db.add_row(var.SCHEMA, var.AREA, area_values)
+        areas.append((area_values, polygon))
 
-        geom_values = {
-            'idx': str(id_data),
-            'geom': polygon
-        }
-        db.add_row(var.SCHEMA, var.GEO, geom_values)
+    db.add_areas_with_geometries(var.SCHEMA, var.AREA, var.GEO, areas)
 
     return render_template("newarea.html", new_area_lang=var_lang.NEW_AREA, new_path_lang=var_lang.NEW_PATH,
                            tables_lang=var_lang.TABLES, toa_lang=var_lang.TOA, avoid_lang=var_lang.AVOID,
@@ -212,8 +210,7 @@ def new_path(typ):
                 mypolyline_coordinates = [[cordDict['lat'], cordDict['lng']] for cordDict in polyline]
                 polyline_coordinates.append(mypolyline_coordinates)
 
-            for polyline in polyline_coordinates:
-                util.add_path_to_db(polyline, date)
+            util.add_paths_to_db(polyline_coordinates, date)
 
             submit_manuell_path_response = "saved successfully"
 
@@ -237,9 +234,8 @@ def new_path(typ):
                 df = df[df['date'].isin([date])]
                 df = dutil.add_has_images_col(df)
 
-                db.convert_to_geojson_file(var.SCHEMA, var.GEO, var.GEO_FILE)
-                with open(var.GEO_FILE, 'r') as file:
-                    geojson = json.load(file)
+                # the coordinates are swapped in place below, so work on a private copy
+                geojson = json.loads(db.get_geojson(var.SCHEMA, var.GEO))
 
                 filtered_data = [item for item in geojson["features"] if item["id"] in df["idx"].values.tolist()]
 
@@ -284,10 +280,7 @@ def new_path(typ):
 
                 try:
                     path_ids = path_ids.split(',')
-                    for path_id in path_ids:
-                        # path_id = int(path_id)
-                        path = paths[path_id]
-                        util.add_path_to_db(path, date)
+                    util.add_paths_to_db([paths[path_id] for path_id in path_ids], date)
                 except:
                     show_error = True
                     approve_map = False
@@ -300,9 +293,8 @@ def new_path(typ):
                 df = df[df['date'].isin([date])]
                 df = dutil.add_has_images_col(df)
 
-                db.convert_to_geojson_file(var.SCHEMA, var.GEO, var.GEO_FILE)
-                with open(var.GEO_FILE, 'r') as file:
-                    geojson = json.load(file)
+                # the coordinates are swapped in place below, so work on a private copy
+                geojson = json.loads(db.get_geojson(var.SCHEMA, var.GEO))
 
                 filtered_data = [item for item in geojson["features"] if item["id"] in df["idx"].values.tolist()]
 
@@ -325,8 +317,7 @@ def new_path(typ):
                 paths = output['routes']
                 approve_map = True
 
-                for path_id in range(1, len(paths) + 1):
-                    util.add_path_to_db(paths[str(path_id)], date)
+                util.add_paths_to_db([paths[str(path_id)] for path_id in range(1, len(paths) + 1)], date)
                 if show_error == True:
                     approve_map = False
 
@@ -399,6 +390,36 @@ def changelog():
 #         # date_lang=None,
 #     )
 
+@app.route("/data/geo.json", methods=["GET"])
+def geo_json():
+    ''' serves the cached geojson of all areas '''
+    return app.response_class(db.get_geojson(var.SCHEMA, var.GEO), mimetype='application/geo+json')
+
+
+@app.route("/tiles/<layer>/<int:z>/<int:x>/<int:y>.mvt", methods=["GET"])
+def vector_tile(layer, z, x, y):
+    ''' serves a mapbox vector tile of the area, path or trajectory layer, ?date= restricts it to dates '''
+    try:
+        tile, etag = vector_tiles.get_tile(var.SCHEMA, layer, z, x, y, dates=request.args.getlist('date'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
+    response = app.response_class(tile, mimetype='application/vnd.mapbox-vector-tile')
+    # browsers revalidate and get a 304 as long as the layer's tables did not change
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.route("/metrics/db", methods=["GET"])
+def db_metrics():
+    ''' query statistics per route and dash callback, ?reset=1 starts a new measurement '''
+    stats = metrics.snapshot()
+    if request.args.get('reset', default=0, type=int) == 1:
+        metrics.reset()
+    return jsonify({'slow_query_ms': metrics.SLOW_QUERY_MS, 'buckets_ms': metrics.BUCKETS_MS, 'queries': stats})
+
+
 @app.route("/tables/get/info", methods=["GET"])
 def format_parameters():
     ''' formats url parameters before redirecting to table_view() '''
@@ -415,88 +436,119 @@ def format_parameters():
     return {'success': 200, 'redirect': '/tables/view/' + req_typ + parameters}
 
 
+@app.route("/tables/page/<typ>", methods=["GET"])
+def table_page(typ):
+    ''' returns one page of a table as json, filtered, sorted and paged in the database '''
+    tables = {
+        var.AREA: (var.AREA, var.AREA_COLS),
+        var.PATH: (var.PATH, var.PATH_COLS),
+        var.TRAJ: (var.traj, var.TRAJ_COLS)
+    }
+    if typ not in tables:
+        return jsonify({'error': 'unknown table ' + typ}), 404
+    table, cols = tables[typ]
+
+    dates = request.args.getlist('date')
+    order_by = request.args.get('sort', default='idx', type=str)
+    descending = request.args.get('desc', default=0, type=int) == 1
+    limit = min(max(request.args.get('limit', default=PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    after = request.args.get('after', default=None, type=str)
+
+    try:
+        after = json.loads(after) if after else None
+        df, next_key = db.open_table_page(var.SCHEMA, table, cols, filter=('date', dates) if dates else None,
+                                          order_by=order_by, after=after, limit=limit, descending=descending)
+    except (ValueError, psycopg2.DataError) as e:
+        # malformed after or date values are rejected by postgres with a DataError
+        return jsonify({'error': str(e).strip()}), 400
+
+    return jsonify({
+        'columns': cols,
+        'rows': df.astype(str).values.tolist(),
+        'next': [json_key(k) for k in next_key] if next_key is not None else None
+    })
+
+
+def json_key(value):
+    """ converts a sort key value to json, NULL stays null so the next page continues inside the NULL block """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if hasattr(value, 'isoformat'):
+        # dates and timestamps
+        return value.isoformat()
+    return value
+
+
 @app.route("/tables/<action>/<typ>", methods=["GET", "POST"])
 def table_view(action, typ):
     var_lang = language_utils.get_language_module()
 
-    area = {
-        'df': db.open_table(var.SCHEMA, var.AREA, var.AREA_COLS),
+    if request.method == "POST":
+        # rows are addressed by their idx, see table_frame()
+        data = request.get_json()
+        current_table = var.AREA if typ == var.AREA else var.PATH if typ == var.PATH else var.traj
+        identifier = 'idx'
+
+        if action == var.SAVE:
+            # update changed values of all edited rows in one transaction
+            updates = {(str(key) if typ == var.PATH else int(key)): value for key, value in data.items()}
+            db.update_rows(var.SCHEMA, current_table, updates, identifier)
+
+        if action == var.DELETE:
+            # delete all checked rows at once
+            ids = [str(row) if typ == var.PATH else int(row) for row in data]
+            db.delete_rows(var.SCHEMA, current_table, (identifier, ids))
+        return {'success': 200, 'redirect': '/tables/view/' + typ}
+
+    area = dict(first_page(var.AREA, var.AREA_COLS), **{
         'editable_cols': ['date', 'type', 'description'],
         'hidden_cols': [],
         'type': var.AREA
-    }
-    path = {
-        'df': db.open_table(var.SCHEMA, var.PATH, var.PATH_COLS),
+    })
+    path = dict(first_page(var.PATH, var.PATH_COLS), **{
         'editable_cols': ['date'],
         'hidden_cols': ['path_id'],
         'type': var.PATH
-    }
-    TRAJ_OBJ = {
-        'editable_cols': [],
-        'hidden_cols': ['date'],
-        'type': var.TRAJ,
-        'max_rows': 100,
-        'filter': 0
-    }
+    })
+    traj = dict(TRAJ_OBJ, hidden_cols=list(TRAJ_OBJ['hidden_cols']))
+    traj['dates'] = dutil.trajectory_dates()
 
-    # read full trajectory database just once, then save to a pandas dataframe in a global variable
-    if len(util.contains_keys(['dfs'], TRAJ_OBJ)) == 0:
-        TRAJ_OBJ['dfs'] = db.open_table(var.SCHEMA, var.traj, var.TRAJ_COLS)
-        TRAJ_OBJ['dfs']['date'] = TRAJ_OBJ['dfs']['date'].astype(str)
-        TRAJ_OBJ['dates'] = [date[0].strftime('%Y-%m-%d') for date in db.select_distinct(var.SCHEMA, var.traj, 'date')]
-    req_date = request.args.get('date', default=TRAJ_OBJ['dates'][0], type=str)
-    try:
-        dfs = TRAJ_OBJ['dfs']
-        df = dfs[dfs['date'] == req_date]
-    except KeyError:
-        df = None
-        req_date = TRAJ_OBJ['dates'][0]
-    TRAJ_OBJ['df'] = df
-    TRAJ_OBJ['req_date'] = req_date
-    # if all rows in current dataframe have no values for the 'mowed_grass' column then hide that column
-    if TRAJ_OBJ['df']['mowed_grass'].isna().sum() == len(df.index):
-        TRAJ_OBJ['hidden_cols'].append('mowed_grass')
-
-    if request.method == "GET":
-        # view tables
-        req_filter = request.args.get('filter', default=0, type=int)
-        TRAJ_OBJ['filter'] = abs(req_filter) + 1
-        return render_template("tables.html", version=var.version, area=area, path=path, traj=TRAJ_OBJ, tab=typ,
-                               new_area_lang=var_lang.NEW_AREA, new_path_lang=var_lang.NEW_PATH,
-                               tables_lang=var_lang.TABLES, area_lang=var_lang.AREA, path_lang=var_lang.PATH,
-                               trajectory_lang=var_lang.TRAJECTORY, save_all_lang=var_lang.SAVE_ALL,
-                               add_area_lang=var_lang.ADD_AREA, delete_lang=var_lang.DELETE,
-                               add_path_lang=var_lang.ADD_PATH, cells_double_clicked_lang=var_lang.CELLS_DOUBLE_CLICKED,
-                               language_lang=var_lang.LANGUAGE, english_lang=var_lang.ENGLISH,
-                               german_lang=var_lang.GERMAN)
+    req_date = request.args.get('date', default=None, type=str)
+    if req_date not in traj['dates']:
+        req_date = traj['dates'][0] if traj['dates'] else None
+    traj['req_date'] = req_date
 
-    if request.method == "POST":
-        data = request.get_json()
-        data_table = area['df'] if typ == var.AREA else path['df'] if typ == var.PATH else TRAJ_OBJ['dfs']
-        current_table = var.AREA if typ == var.AREA else var.PATH if typ == var.PATH else var.traj
-        identifier = 'idx'
+    if req_date is None:
+        traj['df'] = None
+    else:
+        traj.update(first_page(var.traj, var.TRAJ_COLS, req_date))
+        # if all rows in current dataframe have no values for the 'mowed_grass' column then hide that column
+        if traj['df']['mowed_grass'].isna().sum() == len(traj['df'].index):
+            traj['hidden_cols'].append('mowed_grass')
 
-        if action == var.SAVE:
-            # update changed values in table
-            for key, value in data.items():
-                row = int(key)
-                id_col = data_table.columns.get_loc(identifier)
-                id = data_table.iloc[row, id_col]
-                id = int(id) if typ == var.AREA or typ == var.traj else str(id)
-                db.update_table(var.SCHEMA, current_table, value, (identifier, id))
+    # view tables
+    return render_template("tables.html", version=var.version, area=area, path=path, traj=traj, tab=typ,
+                           new_area_lang=var_lang.NEW_AREA, new_path_lang=var_lang.NEW_PATH,
+                           tables_lang=var_lang.TABLES, area_lang=var_lang.AREA, path_lang=var_lang.PATH,
+                           trajectory_lang=var_lang.TRAJECTORY, save_all_lang=var_lang.SAVE_ALL,
+                           add_area_lang=var_lang.ADD_AREA, delete_lang=var_lang.DELETE,
+                           add_path_lang=var_lang.ADD_PATH, cells_double_clicked_lang=var_lang.CELLS_DOUBLE_CLICKED,
+                           language_lang=var_lang.LANGUAGE, english_lang=var_lang.ENGLISH,
+                           german_lang=var_lang.GERMAN)
+
+
+def first_page(table, cols, date=None):
+    ''' loads the first page of a table for the tables view, the following pages are fetched from table_page() '''
+    df, next_key = db.open_table_page(var.SCHEMA, table, cols, filter=('date', [date]) if date else None,
+                                      limit=PAGE_SIZE)
+    return {
+        'df': table_frame(df),
+        'next': json.dumps([json_key(k) for k in next_key]) if next_key is not None else None,
+        'date': date
+    }
 
-        if action == var.DELETE:
-            for row in data:
-                # delete row from table
-                row = int(row)
-                id_col = data_table.columns.get_loc(identifier)
-                id = str(data_table.iloc[row, id_col]) if typ == var.PATH else int(data_table.iloc[row, id_col])
-                db.delete_row(var.SCHEMA, current_table, (identifier, id))
-        page_url = '/tables/view/' + typ
-        # return {'success': 200, 'redirect': page_url}
-        return render_template('/tables/view/' + typ, version=var.version, area=area, path=path, traj=TRAJ_OBJ, tab=typ,
-                               new_area_lang=var_lang.NEW_AREA, new_path_lang=var_lang.NEW_PATH,
-                               tables_lang=var_lang.TABLES, area_lang=var_lang.AREA, path_lang=var_lang.PATH,
-                               trajectory_lang=var_lang.TRAJECTORY, save_all_lang=var_lang.SAVE_ALL,
-                               add_area_lang=var_lang.ADD_AREA, delete_lang=var_lang.DELETE,
-                               add_path_lang=var_lang.ADD_PATH, cells_double_clicked_lang=var_lang.CELLS_DOUBLE_CLICKED)
+
+def table_frame(df):
+    ''' indexes a table by its idx column, so the rows in the html table carry their database id '''
+    df.index = df['idx'].values
+    return df
@@ -0,0 +1,18 @@
+-- converts interface.geo.geom of an existing database from WKT text to a postgis geometry
+-- new databases created from sql/script.sql already have this layout
+-- run with: psql -U postgres -f 001_geo_geometry.sql
+
+\c haix
+
+BEGIN;
+
+ALTER TABLE interface.geo
+    ALTER COLUMN geom TYPE geometry(Polygon, 4326)
+    USING ST_GeomFromText(geom, 4326);
+
+CREATE INDEX IF NOT EXISTS geo_geom_idx
+    ON interface.geo USING gist (geom);
+
+COMMIT;
+
+ANALYZE interface.geo;
@@ -0,0 +1,9 @@
+-- adds the (date, idx) index used by the paginated tables view to an existing database
+-- run with: psql -U postgres -f 002_trajectory_date_index.sql
+
+\c haix
+
+CREATE INDEX IF NOT EXISTS trajectory_date_idx
+    ON interface.trajectory (date, idx);
+
+ANALYZE interface.trajectory;
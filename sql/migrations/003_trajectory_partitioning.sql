@@ -0,0 +1,64 @@
+-- turns interface.trajectory of an existing database into a table partitioned by month of the mission date
+-- new databases created from sql/script.sql already have this layout
+-- run with: psql -U postgres -f 003_trajectory_partitioning.sql
+
+\c haix
+
+BEGIN;
+
+ALTER TABLE interface.trajectory RENAME TO trajectory_unpartitioned;
+ALTER TABLE interface.trajectory_unpartitioned RENAME CONSTRAINT trajectory_pkey TO trajectory_unpartitioned_pkey;
+DROP INDEX IF EXISTS interface.trajectory_date_idx;
+
+CREATE TABLE interface.trajectory
+(
+    "timestamp" bigint,
+    latitude numeric,
+    longitude numeric,
+    date date NOT NULL,
+    mowed_grass integer,
+    idx bigint NOT NULL,
+    CONSTRAINT trajectory_pkey PRIMARY KEY (idx, date)
+) PARTITION BY RANGE (date);
+
+CREATE OR REPLACE FUNCTION interface.ensure_trajectory_partition(day date)
+    RETURNS text
+    LANGUAGE plpgsql
+AS $$
+DECLARE
+    first_day date := date_trunc('month', day)::date;
+    partition_name text := 'trajectory_' || to_char(day, 'YYYY_MM');
+BEGIN
+    IF to_regclass('interface.' || partition_name) IS NULL THEN
+        EXECUTE format('CREATE TABLE interface.%I PARTITION OF interface.trajectory FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, first_day, (first_day + interval '1 month')::date);
+    END IF;
+    RETURN partition_name;
+EXCEPTION
+    WHEN duplicate_table THEN
+        RETURN partition_name;
+END;
+$$;
+
+CREATE INDEX trajectory_date_idx
+    ON interface.trajectory (date, idx);
+
+CREATE INDEX trajectory_timestamp_brin
+    ON interface.trajectory USING brin ("timestamp");
+
+SELECT interface.ensure_trajectory_partition(day)
+FROM (SELECT DISTINCT date AS day FROM interface.trajectory_unpartitioned WHERE date IS NOT NULL) days;
+
+-- rows without a date cannot be routed to a partition and stay in the old table,
+-- drop interface.trajectory_unpartitioned once it is empty
+INSERT INTO interface.trajectory(timestamp, latitude, longitude, date, mowed_grass, idx)
+SELECT timestamp, latitude, longitude, date, mowed_grass, idx
+FROM interface.trajectory_unpartitioned
+WHERE date IS NOT NULL;
+
+DELETE FROM interface.trajectory_unpartitioned
+WHERE date IS NOT NULL;
+
+COMMIT;
+
+ANALYZE interface.trajectory;
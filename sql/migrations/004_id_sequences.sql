@@ -0,0 +1,36 @@
+-- backs the generated keys of an existing database with sequences, replacing MAX(id) + 1 in the app
+-- new databases created from sql/script.sql already have this layout
+-- run with: psql -U postgres -f 004_id_sequences.sql
+
+\c haix
+
+BEGIN;
+
+-- keeps concurrent inserts out until the sequences continue after the current rows
+LOCK TABLE interface.area, interface.path, interface.trajectory IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE SEQUENCE IF NOT EXISTS interface.area_idx_seq
+    OWNED BY interface.area.idx;
+
+ALTER TABLE interface.area
+    ALTER COLUMN idx SET DEFAULT nextval('interface.area_idx_seq');
+
+SELECT setval('interface.area_idx_seq', COALESCE(MAX(idx), 0) + 1, false)
+FROM interface.area;
+
+CREATE SEQUENCE IF NOT EXISTS interface.path_path_id_seq
+    OWNED BY interface.path.path_id;
+
+SELECT setval('interface.path_path_id_seq', COALESCE(MAX(path_id), 0) + 1, false)
+FROM interface.path;
+
+CREATE SEQUENCE IF NOT EXISTS interface.trajectory_idx_seq
+    OWNED BY interface.trajectory.idx;
+
+ALTER TABLE interface.trajectory
+    ALTER COLUMN idx SET DEFAULT nextval('interface.trajectory_idx_seq');
+
+SELECT setval('interface.trajectory_idx_seq', COALESCE(MAX(idx), 0) + 1, false)
+FROM interface.trajectory;
+
+COMMIT;
@@ -0,0 +1,35 @@
+-- announces writes to the interface tables on the haix_changes channel of an existing database
+-- new databases created from sql/script.sql already have these triggers
+-- run with: psql -U postgres -f 005_change_notifications.sql
+
+\c haix
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION interface.notify_change()
+    RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('haix_changes', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE TRIGGER area_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interface.area
+    FOR EACH STATEMENT EXECUTE FUNCTION interface.notify_change();
+
+CREATE OR REPLACE TRIGGER geo_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interface.geo
+    FOR EACH STATEMENT EXECUTE FUNCTION interface.notify_change();
+
+CREATE OR REPLACE TRIGGER path_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interface.path
+    FOR EACH STATEMENT EXECUTE FUNCTION interface.notify_change();
+
+CREATE OR REPLACE TRIGGER trajectory_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interface.trajectory
+    FOR EACH STATEMENT EXECUTE FUNCTION interface.notify_change();
+
+COMMIT;
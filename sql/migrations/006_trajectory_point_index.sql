@@ -0,0 +1,9 @@
+-- adds the spatial index used by the trajectory vector tiles to an existing database
+-- run with: psql -U postgres -f 006_trajectory_point_index.sql
+
+\c haix
+
+CREATE INDEX IF NOT EXISTS trajectory_point_idx
+    ON interface.trajectory USING gist (ST_SetSRID(ST_MakePoint(longitude::float8, latitude::float8), 4326));
+
+ANALYZE interface.trajectory;
@@ -38,6 +38,17 @@ FROM '/docker-entrypoint-initdb.d/area.csv'
 DELIMITER ','
 CSV HEADER;
 
+-- new area ids come from a sequence, it continues after the imported rows
+
+CREATE SEQUENCE IF NOT EXISTS interface.area_idx_seq
+    OWNED BY interface.area.idx;
+
+ALTER TABLE interface.area
+    ALTER COLUMN idx SET DEFAULT nextval('interface.area_idx_seq');
+
+SELECT setval('interface.area_idx_seq', COALESCE(MAX(idx), 0) + 1, false)
+FROM interface.area;
+
 SELECT * FROM interface.area
 ORDER BY idx ASC;
 
@@ -46,7 +57,7 @@ ORDER BY idx ASC;
 CREATE TABLE IF NOT EXISTS interface.geo
 (
     idx integer NOT NULL,
-    geom text COLLATE pg_catalog."default",
+    geom geometry(Polygon, 4326),
     CONSTRAINT geom_pkey PRIMARY KEY (idx),
     CONSTRAINT f_idx FOREIGN KEY (idx)
         REFERENCES interface.area (idx) MATCH SIMPLE
@@ -55,11 +66,28 @@ CREATE TABLE IF NOT EXISTS interface.geo
         NOT VALID
 );
 
-COPY interface.geo(idx, geom)
+-- the csv holds plain WKT without SRID, so it is loaded through a staging table
+
+CREATE TEMP TABLE geo_import
+(
+    idx integer,
+    geom text
+);
+
+COPY geo_import(idx, geom)
 FROM '/docker-entrypoint-initdb.d/geo.csv'
 DELIMITER ','
 CSV HEADER;
 
+INSERT INTO interface.geo(idx, geom)
+SELECT idx, ST_GeomFromText(geom, 4326)
+FROM geo_import;
+
+DROP TABLE geo_import;
+
+CREATE INDEX IF NOT EXISTS geo_geom_idx
+    ON interface.geo USING gist (geom);
+
 SELECT * FROM interface.geo
 ORDER BY idx ASC;
 
@@ -80,26 +108,134 @@ FROM '/docker-entrypoint-initdb.d/path.csv'
 DELIMITER ','
 CSV HEADER;
 
+-- all points of a path share one path_id, new ones are reserved from this sequence before inserting
+
+CREATE SEQUENCE IF NOT EXISTS interface.path_path_id_seq
+    OWNED BY interface.path.path_id;
+
+SELECT setval('interface.path_path_id_seq', COALESCE(MAX(path_id), 0) + 1, false)
+FROM interface.path;
+
 SELECT * FROM interface.path
 ORDER BY idx ASC;
 
--- set up trajectory table
+-- set up trajectory table, range partitioned by mission date with one partition per month
 
 CREATE TABLE IF NOT EXISTS interface.trajectory
 (
     "timestamp" bigint,
     latitude numeric,
     longitude numeric,
-    date date,
+    date date NOT NULL,
     mowed_grass integer,
     idx bigint NOT NULL,
-    CONSTRAINT trajectory_pkey PRIMARY KEY (idx)
+    CONSTRAINT trajectory_pkey PRIMARY KEY (idx, date)
+) PARTITION BY RANGE (date);
+
+-- creates the partition holding a date if it does not exist yet, returns its name
+
+CREATE OR REPLACE FUNCTION interface.ensure_trajectory_partition(day date)
+    RETURNS text
+    LANGUAGE plpgsql
+AS $$
+DECLARE
+    first_day date := date_trunc('month', day)::date;
+    partition_name text := 'trajectory_' || to_char(day, 'YYYY_MM');
+BEGIN
+    IF to_regclass('interface.' || partition_name) IS NULL THEN
+        EXECUTE format('CREATE TABLE interface.%I PARTITION OF interface.trajectory FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, first_day, (first_day + interval '1 month')::date);
+    END IF;
+    RETURN partition_name;
+EXCEPTION
+    -- another session created the partition in the meantime
+    WHEN duplicate_table THEN
+        RETURN partition_name;
+END;
+$$;
+
+-- per date reads of the tables view page through a date's rows in idx order
+
+CREATE INDEX IF NOT EXISTS trajectory_date_idx
+    ON interface.trajectory (date, idx);
+
+-- timestamps grow with the insert order, so a brin index covers time ranges at a tiny size
+
+CREATE INDEX IF NOT EXISTS trajectory_timestamp_brin
+    ON interface.trajectory USING brin ("timestamp");
+
+-- the trajectory has no geometry column, vector tiles filter on this expression instead
+
+CREATE INDEX IF NOT EXISTS trajectory_point_idx
+    ON interface.trajectory USING gist (ST_SetSRID(ST_MakePoint(longitude::float8, latitude::float8), 4326));
+
+-- the partitions have to exist before the rows are copied, so the csv is loaded through a staging table
+
+CREATE TEMP TABLE trajectory_import
+(
+    "timestamp" bigint,
+    latitude numeric,
+    longitude numeric,
+    date date,
+    mowed_grass integer,
+    idx bigint
 );
 
-COPY interface.trajectory(timestamp, latitude, longitude, date, mowed_grass, idx)
+COPY trajectory_import(timestamp, latitude, longitude, date, mowed_grass, idx)
 FROM '/docker-entrypoint-initdb.d/trajectory.csv'
 DELIMITER ','
 CSV HEADER;
 
+SELECT interface.ensure_trajectory_partition(day)
+FROM (SELECT DISTINCT date AS day FROM trajectory_import WHERE date IS NOT NULL) days;
+
+-- rows without a date cannot be routed to a partition and are skipped, like in migration 003
+INSERT INTO interface.trajectory(timestamp, latitude, longitude, date, mowed_grass, idx)
+SELECT timestamp, latitude, longitude, date, mowed_grass, idx
+FROM trajectory_import
+WHERE date IS NOT NULL;
+
+DROP TABLE trajectory_import;
+
+-- new trajectory ids come from a sequence, it continues after the imported rows
+
+CREATE SEQUENCE IF NOT EXISTS interface.trajectory_idx_seq
+    OWNED BY interface.trajectory.idx;
+
+ALTER TABLE interface.trajectory
+    ALTER COLUMN idx SET DEFAULT nextval('interface.trajectory_idx_seq');
+
+SELECT setval('interface.trajectory_idx_seq', COALESCE(MAX(idx), 0) + 1, false)
+FROM interface.trajectory;
+
 SELECT * FROM interface.trajectory
-ORDER BY idx ASC;
\ No newline at end of file
+ORDER BY idx ASC;
+
+-- every write to the interface tables is announced on the haix_changes channel,
+-- so the caches of all app processes can drop what they hold of that table
+
+CREATE OR REPLACE FUNCTION interface.notify_change()
+    RETURNS trigger
+    LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('haix_changes', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER area_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interface.area
+    FOR EACH STATEMENT EXECUTE FUNCTION interface.notify_change();
+
+CREATE TRIGGER geo_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interface.geo
+    FOR EACH STATEMENT EXECUTE FUNCTION interface.notify_change();
+
+CREATE TRIGGER path_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interface.path
+    FOR EACH STATEMENT EXECUTE FUNCTION interface.notify_change();
+
+CREATE TRIGGER trajectory_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interface.trajectory
+    FOR EACH STATEMENT EXECUTE FUNCTION interface.notify_change();
@@ -67,17 +67,67 @@ function resetPage(checked_boxes) {
   })
 }
 
-function updateTable(type, dropdown, show_more=null) {
-  filter = show_more == null ? 0 : document.getElementById(show_more).value
+function updateTable(type, dropdown) {
   url = '/tables/get/info'
   params = {
     'type': type,
-    'date': document.getElementById(dropdown).value,
-    'filter': filter
+    'date': document.getElementById(dropdown).value
   }
   callServer(url, "GET", jQuery.param(params), () => {})
 }
 
+function showMore(type) {
+  button = document.getElementById(`show_more_${type}`)
+  params = {'after': button.dataset.next}
+  if (button.dataset.date) {
+    params['date'] = button.dataset.date
+  }
+  $.ajax({
+    url: `/tables/page/${type}`,
+    type: "GET",
+    data: jQuery.param(params),
+    success: function(response) {
+      appendRows(type, response.columns, response.rows)
+      if (response.next == null) {
+        button.remove()
+      } else {
+        button.dataset.next = JSON.stringify(response.next)
+      }
+    },
+    error: function(error) {
+      console.log(error);
+    }
+  });
+}
+
+function appendRows(type, columns, rows) {
+  // builds the rows like the build_table macro in area-table.html
+  table = document.getElementById(`data_table_${type}`)
+  editable = JSON.parse(table.dataset.editable)
+  hidden = JSON.parse(table.dataset.hidden)
+  body = document.getElementById(`table_body_${type}`)
+  idx = columns.indexOf('idx')
+  rows.forEach(row => {
+    i = row[idx]
+    tr = document.createElement('tr')
+    tr.id = `table-${i}`
+    tr.innerHTML = `<td><input class="form-check-input" type="checkbox" name="checkbox" id="checkbox_${type}_${i}"></td>`
+    columns.forEach((col, j) => {
+      if (hidden.includes(col.toLowerCase())) {
+        return
+      }
+      td = document.createElement('td')
+      td.textContent = row[j]
+      if (editable.includes(col.toLowerCase())) {
+        td.id = `editable_${type}_${col}_${i}`
+        td.ondblclick = editValue.bind(null, type, col, i)
+      }
+      tr.appendChild(td)
+    })
+    body.appendChild(tr)
+  })
+}
+
 function callServer(url, type, data, success, success_param=null) {
   $.ajax({
     url: url,
@@ -1,5 +1,6 @@
 from flask import url_for
 import os
+import threading
 from collections import defaultdict
 from utils import variables as var
 from dash import html
@@ -14,62 +15,89 @@ from utils import variables as var
 from flask.helpers import get_root_path
 from datetime import datetime
 from utils.database import database as db
+from utils import geodesy, video_index
 
-def get_index(own_timestamp: float, date: str):
-    if os.path.exists(var.VID_DATA_PATH + var.maschsee + date + ".csv"):
-        data = pd.read_csv(var.VID_DATA_PATH + var.maschsee + date + ".csv")
-
-        for index, row in data.iterrows():
-            if own_timestamp <= row['Timestamp']:
-                result_index = index - 1
-                break
+# distinct dates per table and the dropdown choices built from them, each with the table versions they were read at
+DATE_INDEX = {}
+DATE_INDEX_LOCK = threading.Lock()
+# length in km per path id, valid for the path table version it was measured at
+PATH_LENGTHS = {'version': None, 'lengths': {}}
+PATH_LENGTHS_LOCK = threading.Lock()
 
-        return [result_index, data.loc[result_index, 'first_lat'], data.loc[result_index, 'first_lon'], data.loc[result_index, 'last_lat'], data.loc[result_index, 'last_lon']]
-    else:
-        return 0
+def get_index(own_timestamp: float, date: str):
+    return video_index.segment_at(date, own_timestamp)
     
 def get_time(own_timestamp: float, date: str, topic: str):
-    if os.path.exists(var.VID_DATA_PATH + var.maschsee + date + "_" + topic + ".csv"):
-        data = pd.read_csv(var.VID_DATA_PATH + var.maschsee + date +  "_" + topic + ".csv")
-
-        for index, row in data.iterrows():
-            if own_timestamp < row['Timestamp']:
-                # result_index = index - 1
-                videoTime = row['VideoTime'] - 1
-                break
-
-        if videoTime < 0:
-            videoTime = 0
-        return videoTime
-    else:
-        return 0
+    return video_index.video_time_at(date, "_" + topic + ".csv", own_timestamp)
     
 def get_ir_time_by_rgb_time(rgb_time: float, date: str):
-    if os.path.exists(var.VID_DATA_PATH + var.maschsee + date + var.VIDEO_TIME_RGB_FILE_NAME) and \
-        os.path.exists(var.VID_DATA_PATH + var.maschsee + date + var.VIDEO_TIME_IR_FILE_NAME):
-        data = pd.read_csv(var.VID_DATA_PATH + var.maschsee + date + var.VIDEO_TIME_RGB_FILE_NAME)
-
-        for index, row in data.iterrows():
-            if rgb_time <= row['VideoTime']:
-                rgb_timestamp = row['Timestamp']
-                break
-        
-        data = pd.read_csv(var.VID_DATA_PATH + var.maschsee + date + var.VIDEO_TIME_IR_FILE_NAME)
-        for index, row in data.iterrows():
-            if rgb_timestamp <= row['Timestamp']:
-                ir_time = row['VideoTime']
-                break
-
-        return ir_time
-    else:
-        return 0
+    ir_time = video_index.ir_time_at_rgb_time(date, rgb_time)
+    return ir_time if ir_time is not None else 0
+
+def get_video_url(date: str, video_name: str, hls_name: str):
+    """ returns the url of the HLS playlist of a video if there is one, of the mp4 file otherwise """
+    folder = var.maschsee + date + '/'
+    if os.path.exists(var.VID_FILE_PATH + folder + hls_name):
+        return url_for('static', filename='video/' + folder + hls_name)
+    return url_for('static', filename='video/' + folder + video_name)
+
+def get_areas_at(lat: float, lon: float):
+    """ returns a text listing the areas containing a point, found through the spatial index of the geo table """
+    areas = db.select_containing(var.SCHEMA, var.GEO, ['idx'], lat, lon)
+    if len(areas) == 0:
+        return 'Inside areas: none'
+    return 'Inside areas: ' + ', '.join(str(idx) for idx in areas['idx'])
 
 def format_dates():
-    haix = db.select_distinct(var.SCHEMA, var.AREA, 'date')
-    pathplanning = db.select_distinct(var.SCHEMA, var.PATH, 'date')
-    traj = db.select_distinct(var.SCHEMA, var.traj, 'date')
+    # the choices only change when one of the tables changes, so they are built once per version
+    versions = tuple(db.table_version(var.SCHEMA, table) for table in (var.AREA, var.PATH, var.traj))
+    cached = DATE_INDEX.get('choices')
+    if cached is not None and cached[0] == versions:
+        return list(cached[1])
+
+    haix = select_dates(var.AREA)
+    pathplanning = select_dates(var.PATH)
+    traj = select_dates(var.traj)
     date_choices = append_type_to_dates(haix, pathplanning, traj)
-    return date_choices
+    DATE_INDEX['choices'] = (versions, date_choices)
+    return list(date_choices)
+
+def select_dates(table):
+    """ returns the distinct dates of a table, rescanned only after the table was written to """
+    version = db.table_version(var.SCHEMA, table)
+    cached = DATE_INDEX.get(table)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with DATE_INDEX_LOCK:
+        cached = DATE_INDEX.get(table)
+        if cached is None or cached[0] != version:
+            cached = (version, db.select_distinct(var.SCHEMA, table, 'date'))
+            DATE_INDEX[table] = cached
+    return cached[1]
+
+def path_lengths(path, version):
+    """
+    returns the length in km of every path in a DataFrame sorted by path_id and point order,
+    version is the path table version read before the DataFrame was loaded
+    """
+    with PATH_LENGTHS_LOCK:
+        if PATH_LENGTHS['version'] != version:
+            PATH_LENGTHS['version'] = version
+            PATH_LENGTHS['lengths'] = {}
+        lengths = PATH_LENGTHS['lengths']
+        missing = path[~path['path_id'].isin(list(lengths.keys()))]
+
+    if len(missing) != 0:
+        measured = geodesy.path_lengths_km(missing['path_id'].values, missing['lat'].values, missing['lon'].values)
+        with PATH_LENGTHS_LOCK:
+            if PATH_LENGTHS['version'] == version:
+                lengths.update(measured)
+        return {**lengths, **measured}
+    return lengths
+
+def trajectory_dates():
+    """ returns the dates with trajectory data as sorted 'YYYY-MM-DD' strings """
+    return sorted([date[0].strftime('%Y-%m-%d') for date in select_dates(var.traj) if date[0] is not None])
 
 def append_type_to_dates(haix, pathplanning, traj):
     dates = defaultdict(list)
@@ -127,71 +155,52 @@ def add_images(id):
         return image_block
     return None
 
-def clear_map(fig):
-    data = list(fig.data)
-    for i, chart in enumerate(data):
-        try:
-            if len(chart['lat']) == 2:
-                del data[i]
-                break
-        except Exception:
-            print("fehler")
-
-    fig.data = data
-    return fig
-
-def add_start_stop(fig, start, stop):
-    df = pd.DataFrame([[start[0], start[1], "start"], [stop[0], stop[1], "stop"]], columns=['lat', 'lon', 'type'])
-
+def add_overlay_traces(fig):
+    """
+    adds the empty start/stop and boat traces on top of the map and returns their trace indices,
+    the callbacks move these markers with dash.Patch instead of sending the whole figure
+    """
     fig.add_scattermapbox(
-        lat=df["lat"],
-        lon=df["lon"],
-        text=df["type"],
+        lat=[],
+        lon=[],
+        text=["start", "stop"],
+        name='start/stop',
+        hoverinfo='text',
         marker={
             'color': ['green', 'red'],
             'size': 8
         }
     )
-
-    return fig
-
-def clear_boat(fig):
-    data = list(fig.data)
-    for i, chart in enumerate(data):
-        try:
-            if len(chart['lat']) == 1:
-                del data[i]
-                break
-        except Exception:
-            print("fehler")
-
-    fig.data = data
-    return fig
-
-def add_boat_positions(fig, curentRgbTime, date, video_name):
-
-    if os.path.exists(var.VID_DATA_PATH + var.maschsee + date + video_name):
-        data = pd.read_csv(var.VID_DATA_PATH + var.maschsee + date + video_name)
-
-        for _, row in data.iterrows():
-            if curentRgbTime <= row['VideoTime']:
-                rgb_timestamp = row['Timestamp']
-                boat_lat = row['Latitude']
-                boat_lon = row['Longitude']
-                break
-            
     fig.add_scattermapbox(
-        lat=[boat_lat],
-        lon=[boat_lon],
-        text='data["type"]',
+        lat=[],
+        lon=[],
         name='boat',
+        hoverinfo='skip',
         marker={
             'color': 'blue',
             'size': 8
         }
     )
-
-    return fig
+    return {'start_stop': len(fig.data) - 2, 'boat': len(fig.data) - 1}
+
+def clear_start_stop(patch, overlays):
+    patch['data'][overlays['start_stop']]['lat'] = []
+    patch['data'][overlays['start_stop']]['lon'] = []
+    return patch
+
+def set_start_stop(patch, overlays, start, stop):
+    patch['data'][overlays['start_stop']]['lat'] = [start[0], stop[0]]
+    patch['data'][overlays['start_stop']]['lon'] = [start[1], stop[1]]
+    return patch
+
+def move_boat(patch, overlays, lat, lon):
+    patch['data'][overlays['boat']]['lat'] = [lat]
+    patch['data'][overlays['boat']]['lon'] = [lon]
+    return patch
+
+def get_boat_position(curentRgbTime, date, video_name):
+    """ returns latitude and longitude of the boat at a video time, None without video info """
+    return video_index.position_at_video_time(date, video_name, curentRgbTime)
 
 def clean_dates(dates):
     clean_dates = []
@@ -1,31 +1,256 @@
 import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 import psycopg2
-from psycopg2 import sql
+from psycopg2 import sql, pool, extras
+import numpy as np
 import pandas as pd
 import re
 import html
 import json
 import ast
+import logging
+from collections import defaultdict
 
-CONN = None
-
-def init_cursor():
-    """ initializes a connection to the database """
-    global CONN
-    if CONN == None:
-        CONN = psycopg2.connect(
-                host="postgis_container",
-                database="haix",
-                user="postgres",
-                password="secret"
+from utils.database import metrics
+
+DB_HOST = os.environ.get('HAIX_DB_HOST', 'postgis_container')
+DB_NAME = os.environ.get('HAIX_DB_NAME', 'haix')
+DB_USER = os.environ.get('HAIX_DB_USER', 'postgres')
+DB_PASSWORD = os.environ.get('HAIX_DB_PASSWORD', 'secret')
+# pool sizes, both per process; gunicorn workers each get their own pool
+POOL_MIN_CONN = int(os.environ.get('HAIX_DB_POOL_MIN', 1))
+POOL_MAX_CONN = int(os.environ.get('HAIX_DB_POOL_MAX', 10))
+# seconds to wait for a free connection before giving up
+POOL_TIMEOUT = float(os.environ.get('HAIX_DB_POOL_TIMEOUT', 30))
+# connections idle for longer than this are pinged before being handed out
+HEALTH_CHECK_INTERVAL = float(os.environ.get('HAIX_DB_HEALTH_CHECK_INTERVAL', 30))
+
+POOL = None
+POOL_PID = None
+POOL_LOCK = threading.Lock()
+POOL_SLOTS = threading.BoundedSemaphore(POOL_MAX_CONN)
+LAST_USED = {}
+# called whenever a process opens its pool, e.g. to start per process threads after a fork
+PROCESS_HOOKS = []
+LOGGER = logging.getLogger('haix.db')
+# rows fetched per round trip by the streaming reads
+STREAM_CHUNK_SIZE = int(os.environ.get('HAIX_DB_STREAM_CHUNK_SIZE', 10000))
+
+# spatial reference of the geometry columns, see sql/script.sql
+SRID = 4326
+
+# in-process change counters per (schema, table), caches compare against them
+TABLE_VERSIONS = {}
+# raised when changes may have been missed, e.g. while the change listener reconnects
+VERSION_EPOCH = {'value': 0}
+VERSION_LOCK = threading.Lock()
+# tables whose rows change through a foreign key cascade when another table changes
+DEPENDENT_TABLES = {'area': ['geo']}
+# columns whose values are drawn from a sequence, see sql/script.sql
+ID_COLUMNS = {'area': 'idx', 'path': 'path_id', 'trajectory': 'idx'}
+
+# sql types of the table columns, read once per process
+COLUMN_TYPES = {}
+
+GEOJSON_CACHE = {}
+GEOJSON_LOCK = threading.Lock()
+
+def init_pool():
+    """ creates the connection pool of this process on first use """
+    global POOL, POOL_PID
+    with POOL_LOCK:
+        # a pool inherited through fork shares its sockets with the parent, start a new one
+        if POOL is None or POOL_PID != os.getpid():
+            POOL = pool.ThreadedConnectionPool(
+                POOL_MIN_CONN,
+                POOL_MAX_CONN,
+                host=DB_HOST,
+                database=DB_NAME,
+                user=DB_USER,
+                password=DB_PASSWORD
             )
-    cur = CONN.cursor()
-    return cur
+            POOL_PID = os.getpid()
+            LAST_USED.clear()
+            new_pool = True
+        else:
+            new_pool = False
+    if new_pool:
+        for hook in PROCESS_HOOKS:
+            hook()
+    return POOL
+
+def close_pool():
+    """ closes all connections of the pool """
+    global POOL
+    with POOL_LOCK:
+        if POOL is not None and POOL_PID == os.getpid():
+            POOL.closeall()
+        POOL = None
+        LAST_USED.clear()
+
+def is_healthy(conn):
+    """ checks that a connection is open and still answers queries """
+    if conn.closed:
+        return False
+    if time.monotonic() - LAST_USED.get(id(conn), 0) < HEALTH_CHECK_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def get_connection():
+    """ checks out a healthy connection from the pool, reconnecting if needed """
+    if not POOL_SLOTS.acquire(timeout=POOL_TIMEOUT):
+        raise pool.PoolError("no database connection available after {} seconds".format(POOL_TIMEOUT))
+    try:
+        conn_pool = init_pool()
+        # after a database restart every idle connection is dead, they are dropped one by one
+        # until the pool has to open a fresh connection
+        for _ in range(POOL_MAX_CONN + 1):
+            conn = conn_pool.getconn()
+            if is_healthy(conn):
+                return conn
+            LAST_USED.pop(id(conn), None)
+            conn_pool.putconn(conn, close=True)
+            # the remaining idle connections are likely dead as well, ping them before their next use
+            LAST_USED.clear()
+        raise psycopg2.OperationalError("no healthy database connection after {} attempts".format(POOL_MAX_CONN + 1))
+    except Exception:
+        POOL_SLOTS.release()
+        raise
+
+def put_connection(conn, discard=False):
+    """ returns a connection to the pool, broken connections are closed """
+    try:
+        if POOL is not None and POOL_PID == os.getpid():
+            if discard or conn.closed:
+                LAST_USED.pop(id(conn), None)
+                POOL.putconn(conn, close=True)
+            else:
+                LAST_USED[id(conn)] = time.monotonic()
+                POOL.putconn(conn)
+    finally:
+        POOL_SLOTS.release()
+
+def table_version(schema, table):
+    """ returns the change counter of a table, it only ever grows """
+    return TABLE_VERSIONS.get((schema, table), 0) + VERSION_EPOCH['value']
+
+def bump_version(schema, table):
+    """ marks everything cached from a table (and its dependent tables) as outdated """
+    with VERSION_LOCK:
+        for name in [table] + DEPENDENT_TABLES.get(table, []):
+            TABLE_VERSIONS[(schema, name)] = TABLE_VERSIONS.get((schema, name), 0) + 1
+
+def bump_all_versions():
+    """ marks everything cached from any table as outdated """
+    with VERSION_LOCK:
+        VERSION_EPOCH['value'] += 1
+
+class InstrumentedCursor(psycopg2.extensions.cursor):
+    """ cursor that reports duration and row count of every statement to the metrics module,
+        a named server-side cursor only declares its query in execute, so its fetches are timed
+        as well and the statement is reported once the cursor is closed """
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if isinstance(query, sql.Composable):
+                query = query.as_string(self)
+            elif isinstance(query, bytes):
+                query = query.decode('utf-8', 'replace')
+            # bulk inserts send whole pages of rows, only their start is of interest
+            query = query[:1000]
+            if self.name is not None:
+                # query text, milliseconds and rows fetched so far
+                self.pending = [query, duration_ms, 0]
+            else:
+                self.report(query, duration_ms, self.rowcount)
+
+    def fetchone(self):
+        row = self.timed_fetch(super().fetchone)
+        self.count_rows(0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.timed_fetch(super().fetchmany) if size is None else self.timed_fetch(super().fetchmany, size)
+        self.count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self.timed_fetch(super().fetchall)
+        self.count_rows(len(rows))
+        return rows
+
+    def timed_fetch(self, fetch, *args):
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            pending = getattr(self, 'pending', None)
+            if pending is not None:
+                pending[1] += (time.perf_counter() - start) * 1000
+
+    def count_rows(self, rows):
+        pending = getattr(self, 'pending', None)
+        if pending is not None:
+            pending[2] += rows
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            pending = getattr(self, 'pending', None)
+            if pending is not None:
+                self.pending = None
+                self.report(*pending)
+
+    @staticmethod
+    def report(query, duration_ms, rows):
+        metrics.record(query, duration_ms, rows)
+        if LOGGER.isEnabledFor(logging.DEBUG):
+            LOGGER.debug('%.1f ms: %s', duration_ms, query)
+
+@contextmanager
+def init_cursor(name=None, itersize=STREAM_CHUNK_SIZE):
+    """ yields a cursor on a pooled connection, commits on success and rolls back on errors
+        a name opens a server-side cursor that fetches itersize rows per round trip """
+    conn = get_connection()
+    discard = False
+    try:
+        with conn.cursor(name=name, cursor_factory=InstrumentedCursor) as cur:
+            if name is not None:
+                cur.itersize = itersize
+            yield cur
+        conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # the connection itself is broken, drop it so the next checkout reconnects,
+        # the other idle connections are pinged before their next use instead of failing a request each
+        discard = True
+        LAST_USED.clear()
+        raise
+    except BaseException:
+        # also covers streaming generators that are closed before they are exhausted
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            discard = True
+        raise
+    finally:
+        put_connection(conn, discard)
 
 def open_table(schema, table, col_list, filter=None, order_by='idx'):
     """ selects columns from a db table, optional filtering by condition """
-    if filter is not None:
-        print(len(filter[1]))
     with init_cursor() as haix:
         col_names = sql.SQL(', ').join(sql.Identifier(n) for n in col_list)
         if filter is None:
@@ -36,7 +261,6 @@ def open_table(schema, table, col_list, filter=None, order_by='idx'):
                                 sql.Identifier(schema, table),
                                 sql.Identifier(order_by)
                             )
-            print(haix.mogrify(query))
             haix.execute(query)
         elif len(filter) == 2 and filter[0] in col_list:
             query = sql.SQL("SELECT {} " +
@@ -48,7 +272,6 @@ def open_table(schema, table, col_list, filter=None, order_by='idx'):
                                 sql.Identifier(filter[0]),
                                 sql.Identifier('idx') 
                             )
-            print(haix.mogrify(query, (filter[1],)))
             haix.execute(query, (filter[1],))
         else:
             return "Filter is incorrectly formatted"
@@ -56,18 +279,136 @@ def open_table(schema, table, col_list, filter=None, order_by='idx'):
         df = pd.DataFrame.from_records(results, columns = col_list)
         return df
 
-def convert_to_geostr(type, coordinate):
-    """ formats type and coordinates to valid postgis geometry string """
+def stream_rows(schema, table, col_list, filter=None, order_by='idx', chunksize=STREAM_CHUNK_SIZE):
+    """ yields lists of at most chunksize rows, read through a server-side cursor """
+    if filter is not None and (len(filter) != 2 or filter[0] not in col_list):
+        raise ValueError("filter has to be a (column, values) pair")
+    with init_cursor(name='haix_stream_' + uuid.uuid4().hex, itersize=chunksize) as haix:
+        query = sql.SQL("SELECT {} " +
+                        "FROM {} " +
+                        "{}" +
+                        "ORDER BY {} ASC").format(
+                            sql.SQL(', ').join(sql.Identifier(n) for n in col_list),
+                            sql.Identifier(schema, table),
+                            sql.SQL("WHERE {} IN %s ").format(sql.Identifier(filter[0])) if filter is not None else sql.SQL(""),
+                            sql.Identifier(order_by)
+                        )
+        values = (tuple(filter[1]),) if filter is not None else None
+        haix.execute(query, values)
+        while True:
+            rows = haix.fetchmany(chunksize)
+            if len(rows) == 0:
+                break
+            yield rows
+
+def open_table_columns(schema, table, col_list, filter=None, order_by='idx', dtypes=None, chunksize=STREAM_CHUNK_SIZE):
+    """ reads a table into one NumPy array per column, without building a tuple per row of the whole result
+        dtypes maps column names to NumPy dtypes, other columns stay object arrays """
+    dtypes = dtypes if dtypes is not None else {}
+    chunks = {col: [] for col in col_list}
+    for rows in stream_rows(schema, table, col_list, filter, order_by, chunksize):
+        for col, values in zip(col_list, zip(*rows)):
+            chunks[col].append(to_array(values, dtypes.get(col, object)))
+    return {col: np.concatenate(chunks[col]) if chunks[col] else np.array([], dtype=dtypes.get(col, object))
+            for col in col_list}
+
+def to_array(values, dtype):
+    """ converts a column of db values to a NumPy array, integer columns with NULLs fall back to float """
+    try:
+        return np.array(values, dtype=dtype)
+    except (TypeError, ValueError):
+        return np.array(values, dtype='float64')
+
+def open_table_page(schema, table, col_list, filter=None, order_by='idx', after=None, limit=100, descending=False):
+    """
+    selects one page of a table sorted by a column, continuing after the sort key of the previous page,
+    rows whose sort column is NULL come last in both directions
+    """
+    if order_by not in col_list or 'idx' not in col_list:
+        raise ValueError("order_by and idx have to be part of col_list")
+    # idx breaks ties, so the sort key of every row is unique
+    keys = ['idx'] if order_by == 'idx' else [order_by, 'idx']
+    direction = "DESC" if descending else "ASC"
+    compare = "<" if descending else ">"
+
+    conditions = []
+    values = []
+    if filter is not None:
+        if len(filter) != 2 or filter[0] not in col_list:
+            raise ValueError("filter has to be a (column, values) pair")
+        conditions.append(sql.SQL("{} IN %s").format(sql.Identifier(filter[0])))
+        values.append(tuple(filter[1]))
+    if after is not None:
+        if len(after) != len(keys):
+            raise ValueError("after has to contain one value per sort key")
+        idx_after = sql.SQL("{} " + compare + " %s").format(sql.Identifier('idx'))
+        if order_by == 'idx':
+            conditions.append(idx_after)
+            values.append(after[0])
+        elif after[0] is None:
+            # inside the trailing NULL block only idx is left to continue on
+            conditions.append(sql.SQL("({} IS NULL AND {})").format(sql.Identifier(order_by), idx_after))
+            values.append(after[1])
+        else:
+            # a row comparison with NULL is never true, so the NULL block is added explicitly
+            conditions.append(sql.SQL("({col} " + compare + " %s OR ({col} = %s AND {idx_after}) OR {col} IS NULL)").format(
+                col=sql.Identifier(order_by),
+                idx_after=idx_after
+            ))
+            values.extend([after[0], after[0], after[1]])
+    values.append(limit)
+
+    with init_cursor() as haix:
+        query = sql.SQL("SELECT {} " +
+                        "FROM {} " +
+                        "{}" +
+                        "ORDER BY {} " +
+                        "LIMIT %s").format(
+                            sql.SQL(', ').join(sql.Identifier(n) for n in col_list),
+                            sql.Identifier(schema, table),
+                            sql.SQL("WHERE {} ").format(sql.SQL(" AND ").join(conditions)) if conditions else sql.SQL(""),
+                            sql.SQL(', ').join(sql.SQL("{} " + direction + " NULLS LAST").format(sql.Identifier(k)) for k in keys)
+                        )
+        haix.execute(query, values)
+        results = haix.fetchall()
+
+    df = pd.DataFrame.from_records(results, columns=col_list)
+    # sort key of the last row, None once the last page is reached
+    next_key = None
+    if len(results) == limit:
+        next_key = [results[-1][col_list.index(k)] for k in keys]
+    return df, next_key
+
+def convert_to_geostr(type, coordinate, srid=SRID):
+    """ formats type and coordinates to a postgis EWKT string, which is stored as a geometry """
     coords = ','.join([str(c[0]) + " " + str(c[1]) for c in coordinate])
-    return "{}(({}))".format(type, coords)
+    return "SRID={};{}(({}))".format(srid, type, coords)
 
-def convert_to_geojson_file(schema, table, outfile_path):
-    """ pulls data from geometry table and writes it to a geojson file """
+def select_containing(schema, table, col_list, lat, lon, geom_col='geom'):
+    """ selects rows whose geometry contains a point, uses the gist index """
+    with init_cursor() as haix:
+        col_names = sql.SQL(', ').join(sql.Identifier(n) for n in col_list)
+        query = sql.SQL("SELECT {} " +
+                        "FROM {} " +
+                        "WHERE ST_Contains({}, ST_SetSRID(ST_MakePoint(%s, %s), %s)) " +
+                        "ORDER BY {} ASC").format(
+                            col_names,
+                            sql.Identifier(schema, table),
+                            sql.Identifier(geom_col),
+                            sql.Identifier('idx')
+                        )
+        values = (lon, lat, SRID)
+        haix.execute(query, values)
+        results = haix.fetchall()
+        return pd.DataFrame.from_records(results, columns=col_list)
+
+def query_geojson(schema, table):
+    """ pulls all geometries of a table as serialized geojson feature collection """
     with init_cursor() as haix:
         query = sql.SQL("SELECT jsonb_build_object(" +
                             "'type', 'FeatureCollection', " +
-                            "'features', jsonb_agg(features.feature)" +
-                        ") FROM (" +
+                            "'features', COALESCE(jsonb_agg(features.feature), '[]'::jsonb)" +
+                        ")::text FROM (" +
                             "SELECT json_build_object(" +
                                 "'type', 'Feature', " +
                                 "'geometry', ST_AsGeoJSON(geom)::json, " +
@@ -77,16 +418,35 @@ def convert_to_geojson_file(schema, table, outfile_path):
                             sql.Identifier('idx'),
                             sql.Identifier(schema, table)
                     )
-        print(haix.mogrify(query))
         haix.execute(query)
         results = haix.fetchall()
+        return results[0][0].encode('utf-8')
+
+def get_geojson(schema, table):
+    """ returns the geometry table as serialized geojson, cached until the table is written to """
+    key = (schema, table)
+    version = table_version(schema, table)
+    cached = GEOJSON_CACHE.get(key)
+    if cached is not None and cached['version'] == version:
+        return cached['bytes']
+    with GEOJSON_LOCK:
+        # another thread may have refreshed the entry while this one waited
+        cached = GEOJSON_CACHE.get(key)
+        if cached is None or cached['version'] != version:
+            cached = {'version': version, 'bytes': query_geojson(schema, table), 'dict': None}
+            GEOJSON_CACHE[key] = cached
+        return cached['bytes']
 
-        with open(outfile_path, "w") as outfile:
-            json.dump(results[0][0], outfile)
+def get_geojson_dict(schema, table):
+    """ returns the cached geojson as dict, it is shared between callers and must not be modified """
+    get_geojson(schema, table)
+    cached = GEOJSON_CACHE[(schema, table)]
+    if cached['dict'] is None:
+        cached['dict'] = json.loads(cached['bytes'])
+    return cached['dict']
 
 def add_row(schema, table, values: dict):
     """ insert a row into a table in the database """
-    global CONN
     with init_cursor() as haix:
         col_names = sql.SQL(', ').join(sql.Identifier(n) for n in values.keys())
 
@@ -99,9 +459,43 @@ def add_row(schema, table, values: dict):
                             parameters
                         )
         values = tuple([j for j in values.values()])
-        print(haix.mogrify(query, values))
         haix.execute(query, values)
-        CONN.commit()
+    bump_version(schema, table)
+
+def add_rows(schema, table, col_list, rows, page_size=1000, replace=None):
+    """ insert many rows into a table in a single transaction,
+        replace is an optional (column, values) pair whose rows are deleted first in the same transaction """
+    if replace is not None and len(replace) != 2:
+        raise ValueError("replace has to be a (column, values) pair")
+    if len(rows) == 0 and replace is None:
+        return 0
+    with init_cursor() as haix:
+        if replace is not None:
+            # IN keeps the values untyped literals, so e.g. date strings compare against a date column
+            haix.execute(sql.SQL("DELETE FROM {} WHERE {} IN %s").format(
+                sql.Identifier(schema, table),
+                sql.Identifier(replace[0])
+            ), (tuple(replace[1]),))
+        col_names = sql.SQL(', ').join(sql.Identifier(n) for n in col_list)
+        query = sql.SQL("INSERT INTO {} ({}) " +
+                        "VALUES %s;").format(
+                            sql.Identifier(schema, table),
+                            col_names
+                        )
+        extras.execute_values(haix, query, rows, page_size=page_size)
+    bump_version(schema, table)
+    return len(rows)
+
+def ensure_trajectory_partitions(schema, dates):
+    """ creates the monthly partitions of the trajectory table that hold the given dates """
+    with init_cursor() as haix:
+        query = sql.SQL("SELECT {}(day) " +
+                        "FROM unnest(%s::date[]) AS day;").format(
+                            sql.Identifier(schema, 'ensure_trajectory_partition')
+                        )
+        haix.execute(query, (list(dates),))
+        results = haix.fetchall()
+        return sorted(set(r[0] for r in results))
 
 def clean(input):
     """ clean user input before adding it to a table """
@@ -113,31 +507,44 @@ def clean(input):
         input = html.escape(input)
     return input
 
-def get_max_id(schema, table):
-    """ return the highest id value from a table """
+def reserve_ids(schema, table, n=1):
+    """ draws n new ids from the sequence of a table in one round trip """
     with init_cursor() as haix:
-        if table is "path":
-            query = sql.SQL("SELECT MAX(path_id) "
-                            "FROM {};").format(
-                sql.Identifier(schema, table)
-            )
-        else:
-            query = sql.SQL("SELECT MAX(idx) "
-                            "FROM {};").format(
-                            sql.Identifier(schema, table)
-                        )
+        return draw_ids(haix, schema, table, n)
 
-        print(haix.mogrify(query))
-        haix.execute(query)
-        results = haix.fetchall()
+def draw_ids(haix, schema, table, n):
+    """ draws n new ids from the sequence of a table on an open cursor """
+    query = sql.SQL("SELECT nextval(seq.name) " +
+                    "FROM (SELECT pg_get_serial_sequence(%s, %s) AS name) seq, " +
+                    "generate_series(1, %s);")
+    values = (sql.Identifier(schema, table).as_string(haix), ID_COLUMNS.get(table, 'idx'), n)
+    haix.execute(query, values)
+    results = haix.fetchall()
+    return [int(r[0]) for r in results]
 
-        if results[0][0] is None:
-            result = 0
-        else:
-            result = int(results[0][0])
-
-        return result
+def add_areas_with_geometries(schema, area_table, geo_table, areas, ids=None):
+    """ inserts areas together with their geometries in one transaction, nothing is kept if one insert fails
+        areas is a list of (area values, geometry string) pairs with the same columns in every area,
+        ids can be reserved beforehand, otherwise they are drawn from the area sequence; returns the ids """
+    if len(areas) == 0:
+        return []
+    col_list = ['idx'] + [col for col in areas[0][0].keys() if col != 'idx']
+    with init_cursor() as haix:
+        if ids is None:
+            ids = draw_ids(haix, schema, area_table, len(areas))
+        area_rows = [(id_data,) + tuple(values[col] for col in col_list[1:]) for id_data, (values, _) in zip(ids, areas)]
+        geo_rows = [(id_data, geom) for id_data, (_, geom) in zip(ids, areas)]
 
+        for table, cols, rows in [(area_table, col_list, area_rows), (geo_table, ['idx', 'geom'], geo_rows)]:
+            query = sql.SQL("INSERT INTO {} ({}) " +
+                            "VALUES %s;").format(
+                                sql.Identifier(schema, table),
+                                sql.SQL(', ').join(sql.Identifier(n) for n in cols)
+                            )
+            extras.execute_values(haix, query, rows)
+    bump_version(schema, area_table)
+    bump_version(schema, geo_table)
+    return ids
 
 def select_distinct(schema, table, col):
     """ return a set of values from a column in a table """
@@ -147,49 +554,107 @@ def select_distinct(schema, table, col):
                             sql.Identifier(col),
                             sql.Identifier(schema, table)
                         )
-        print(haix.mogrify(query))
         haix.execute(query)
         results = haix.fetchall()
         return results
     
 def delete_row(schema, table, filter):
     """ remove a row from a table in the database """
-    global CONN
+    if len(filter) != 2:
+        return "Error while deleting"
     with init_cursor() as haix:
-        if len(filter) == 2:
-            query = sql.SQL("DELETE " +
-                            "FROM {} " +
-                            "WHERE {} = %s").format(
-                                sql.Identifier(schema, table),
-                                sql.Identifier(filter[0]) 
-                            )
-            print(haix.mogrify(query, ((filter[1],))))
-            haix.execute(query, ((filter[1],)))
-            CONN.commit()
-            return "Deleted successfully"
-        else:
-            return "Error while deleting"
+        query = sql.SQL("DELETE " +
+                        "FROM {} " +
+                        "WHERE {} = %s").format(
+                            sql.Identifier(schema, table),
+                            sql.Identifier(filter[0]) 
+                        )
+        haix.execute(query, ((filter[1],)))
+    bump_version(schema, table)
+    return "Deleted successfully"
         
 def update_table(schema, table, values, filter):
     """ update the values of a table where a condition is met """
-    global CONN
+    if len(filter) != 2 or len(values) == 0:
+        return "Error while updating"
+    with init_cursor() as haix:
+        set_values = sql.SQL(', ').join(
+            sql.Composed([sql.Identifier(k), sql.SQL(" = "), sql.Placeholder()]) for k in values.keys()
+        )
+        query = sql.SQL("UPDATE {} " +
+                        "SET {} " +
+                        "WHERE {} = %s").format(
+                            sql.Identifier(schema, table),
+                            set_values,
+                            sql.Identifier(filter[0])
+                        )
+        values.update(id=filter[1])
+        values = tuple(values.values())
+        haix.execute(query, values)
+    bump_version(schema, table)
+    return "Updated successfully"
+
+def column_types(haix, schema, table):
+    """ returns the sql type of every column of a table """
+    key = (schema, table)
+    if key not in COLUMN_TYPES:
+        query = sql.SQL("SELECT attname, format_type(atttypid, atttypmod) " +
+                        "FROM pg_attribute " +
+                        "WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped;")
+        haix.execute(query, (sql.Identifier(schema, table).as_string(haix),))
+        COLUMN_TYPES[key] = dict(haix.fetchall())
+    return COLUMN_TYPES[key]
+
+def update_rows(schema, table, updates: dict, identifier='idx'):
+    """ applies the updates of many rows in one transaction with UPDATE ... FROM (VALUES ...)
+        updates maps the identifier of a row to a dict of its new column values """
+    # rows that change the same columns share one statement
+    groups = defaultdict(list)
+    for id, values in updates.items():
+        if len(values) > 0:
+            groups[tuple(values.keys())].append((id,) + tuple(values.values()))
+    if len(groups) == 0:
+        return "Error while updating"
+
     with init_cursor() as haix:
-        if len(filter) == 2 and len(values) > 0:
-            set_values = sql.SQL(', ').join(
-                sql.Composed([sql.Identifier(k), sql.SQL(" = "), sql.Placeholder()]) for k in values.keys()
+        types = column_types(haix, schema, table)
+        for cols, rows in groups.items():
+            all_cols = (identifier,) + cols
+            unknown = [col for col in all_cols if col not in types]
+            if unknown:
+                raise ValueError("unknown columns " + ', '.join(unknown))
+            # VALUES rows are untyped text, cast every value to the type of its column
+            template = sql.SQL("({})").format(
+                sql.SQL(', ').join(sql.SQL("%s::" + types[col]) for col in all_cols)
             )
-            query = sql.SQL("UPDATE {} " +
+            query = sql.SQL("UPDATE {} AS t " +
                             "SET {} " +
-                            "WHERE {} = %s").format(
+                            "FROM (VALUES %s) AS v ({}) " +
+                            "WHERE t.{} = v.{};").format(
                                 sql.Identifier(schema, table),
-                                set_values,
-                                sql.Identifier(filter[0])
+                                sql.SQL(', ').join(sql.SQL("{} = v.{}").format(sql.Identifier(col), sql.Identifier(col)) for col in cols),
+                                sql.SQL(', ').join(sql.Identifier(col) for col in all_cols),
+                                sql.Identifier(identifier),
+                                sql.Identifier(identifier)
                             )
-            values.update(id=filter[1])
-            values = tuple(values.values())
-            print(haix.mogrify(query, values))
-            haix.execute(query, values)
-            CONN.commit()
-            return "Updated successfully"
-        else:
-            return "Error while updating"
+            extras.execute_values(haix, query, rows, template=template.as_string(haix))
+    bump_version(schema, table)
+    return "Updated successfully"
+
+def delete_rows(schema, table, filter):
+    """ remove all rows whose column value is in a list, in one statement """
+    if len(filter) != 2:
+        return "Error while deleting"
+    ids = list(filter[1])
+    if len(ids) == 0:
+        return "Deleted successfully"
+    with init_cursor() as haix:
+        query = sql.SQL("DELETE " +
+                        "FROM {} " +
+                        "WHERE {} = ANY(%s)").format(
+                            sql.Identifier(schema, table),
+                            sql.Identifier(filter[0])
+                        )
+        haix.execute(query, (ids,))
+    bump_version(schema, table)
+    return "Deleted successfully"
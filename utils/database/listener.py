@@ -0,0 +1,85 @@
+"""
+Cache invalidation across processes through PostgreSQL LISTEN/NOTIFY.
+
+The triggers in sql/script.sql announce every write to the interface tables on the
+haix_changes channel with 'schema.table' as payload. A background thread per process
+listens on that channel and bumps the version of the changed table, which makes all
+caches keyed by database.table_version reload it - no matter which process wrote.
+"""
+import logging
+import os
+import select
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+from utils.database import database as db
+
+CHANNEL = 'haix_changes'
+# listening can be turned off, e.g. for scripts that only write
+ENABLED = os.environ.get('HAIX_DB_LISTEN', '1') == '1'
+# seconds between checks of a silent connection
+POLL_TIMEOUT = 5
+# upper limit of the wait between reconnects in seconds
+MAX_BACKOFF = 60
+
+STATE = {'thread': None, 'pid': None}
+LOCK = threading.Lock()
+LOGGER = logging.getLogger('haix.db.listener')
+
+
+def start_listener():
+    """ starts the listener thread of this process if it is not running yet """
+    if not ENABLED:
+        return None
+    with LOCK:
+        # threads do not survive a fork, every worker process needs its own listener
+        if STATE['thread'] is None or STATE['pid'] != os.getpid() or not STATE['thread'].is_alive():
+            thread = threading.Thread(target=listen_forever, name='haix-db-listener', daemon=True)
+            thread.start()
+            STATE['thread'] = thread
+            STATE['pid'] = os.getpid()
+    return STATE['thread']
+
+
+def listen_forever():
+    """ listens for change notifications, reconnecting with growing waits when the connection breaks """
+    backoff = 1
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(host=db.DB_HOST, database=db.DB_NAME, user=db.DB_USER, password=db.DB_PASSWORD)
+            conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute('LISTEN ' + CHANNEL + ';')
+            # changes made while no one was listening are unknown, so nothing cached can be trusted
+            db.bump_all_versions()
+            backoff = 1
+            LOGGER.info('listening for changes on %s', CHANNEL)
+
+            while True:
+                if select.select([conn], [], [], POLL_TIMEOUT) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    handle_notification(conn.notifies.pop(0).payload)
+        except (psycopg2.Error, OSError) as e:
+            LOGGER.warning('change listener lost its connection, retrying in %s s: %s', backoff, e)
+        finally:
+            if conn is not None and not conn.closed:
+                conn.close()
+        time.sleep(backoff)
+        backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+def handle_notification(payload: str):
+    """ bumps the version of the table named in a notification """
+    schema, _, table = payload.partition('.')
+    if table:
+        db.bump_version(schema, table)
+
+
+# worker processes forked after start_listener() open their own pool and start their own listener
+db.PROCESS_HOOKS.append(start_listener)
@@ -0,0 +1,87 @@
+"""
+Query instrumentation for the database layer.
+
+Every statement run through database.init_cursor() is recorded per calling route or Dash
+callback: number of calls, latency histogram and returned rows. Statements slower than
+HAIX_SLOW_QUERY_MS are logged as warnings.
+"""
+import bisect
+import logging
+import os
+import re
+import threading
+
+from flask import has_request_context, request
+
+# statements slower than this are written to the slow query log
+SLOW_QUERY_MS = float(os.environ.get('HAIX_SLOW_QUERY_MS', 200))
+# upper bounds of the latency histogram buckets in milliseconds, the last bucket is open
+BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+STATS = {}
+LOCK = threading.Lock()
+LOGGER = logging.getLogger('haix.db')
+
+TABLE_PATTERN = re.compile(r'"(\w+)"\."(\w+)"')
+
+
+def current_caller():
+    """ returns the route or Dash callback output that runs the current query """
+    if not has_request_context():
+        return 'background'
+    if request.path.endswith('_dash-update-component'):
+        body = request.get_json(silent=True) or {}
+        return 'callback ' + str(body.get('output', '?'))
+    return request.url_rule.rule if request.url_rule is not None else request.path
+
+
+def statement_name(query: str):
+    """ shortens a statement to its command and first table, e.g. 'SELECT interface.area' """
+    command = query.lstrip().split(' ', 1)[0].upper()
+    table = TABLE_PATTERN.search(query)
+    return command + ' ' + table.group(1) + '.' + table.group(2) if table else command
+
+
+def record(query: str, duration_ms: float, rows=None, caller=None):
+    """ adds one executed statement to the statistics and logs it if it was slow """
+    caller = caller if caller is not None else current_caller()
+    key = (caller, statement_name(query))
+    with LOCK:
+        entry = STATS.get(key)
+        if entry is None:
+            entry = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'histogram': [0] * (len(BUCKETS_MS) + 1)}
+            STATS[key] = entry
+        entry['count'] += 1
+        entry['total_ms'] += duration_ms
+        entry['max_ms'] = max(entry['max_ms'], duration_ms)
+        entry['rows'] += rows if rows is not None and rows > 0 else 0
+        entry['histogram'][bisect.bisect_left(BUCKETS_MS, duration_ms)] += 1
+
+    if duration_ms >= SLOW_QUERY_MS:
+        LOGGER.warning('slow query (%.1f ms, %s rows) from %s: %s', duration_ms, rows, caller, query)
+
+
+def snapshot():
+    """ returns the statistics as json serializable list, the most expensive statements first """
+    labels = ['<=' + str(b) + 'ms' for b in BUCKETS_MS] + ['>' + str(BUCKETS_MS[-1]) + 'ms']
+    with LOCK:
+        entries = [
+            {
+                'caller': caller,
+                'statement': statement,
+                'count': entry['count'],
+                'total_ms': round(entry['total_ms'], 3),
+                'mean_ms': round(entry['total_ms'] / entry['count'], 3),
+                'max_ms': round(entry['max_ms'], 3),
+                'rows': entry['rows'],
+                'histogram': dict(zip(labels, entry['histogram']))
+            }
+            for (caller, statement), entry in STATS.items()
+        ]
+    return sorted(entries, key=lambda e: e['total_ms'], reverse=True)
+
+
+def reset():
+    """ clears all statistics """
+    with LOCK:
+        STATS.clear()
@@ -0,0 +1,148 @@
+"""
+Mapbox vector tiles of the interface tables, rendered by PostGIS with ST_AsMVT.
+
+Each layer only selects the rows inside the requested tile through its spatial index,
+so a map fetches geometry for its viewport and zoom instead of whole tables.
+Rendered tiles are cached per process until one of their tables is written to.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from psycopg2 import sql
+
+from utils.database import database as db
+
+# number of rendered tiles kept per process
+TILE_CACHE_SIZE = int(os.environ.get('HAIX_TILE_CACHE_SIZE', 4096))
+# tile extent in screen pixels as defined by the vector tile specification
+EXTENT = 4096
+# zoom levels outside of this range are not rendered
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+# below this zoom a tile would hold the points of whole missions, the trajectory layer stays empty there
+TRAJECTORY_MIN_ZOOM = 12
+# trajectory points falling into the same cell of this many tile units are sent as one feature
+TRAJECTORY_GRID = 16
+# upper limit of trajectory features per tile
+TRAJECTORY_MAX_POINTS = 20000
+
+TILE_CACHE = OrderedDict()
+LOCK = threading.Lock()
+
+# tables each layer is built from, their versions invalidate the cached tiles
+LAYER_TABLES = {
+    'area': ['area', 'geo'],
+    'path': ['path'],
+    'trajectory': ['trajectory']
+}
+
+LAYER_QUERIES = {
+    'area': (
+        "SELECT ST_AsMVTGeom(ST_Transform(g.geom, 3857), bounds.geom, {extent}) AS geom, "
+        "a.idx, a.type, a.date::text AS date, a.description "
+        "FROM {geo} g JOIN {area} a ON a.idx = g.idx, bounds "
+        "WHERE g.geom && ST_Transform(bounds.geom, {srid}) {date_filter}"
+    ),
+    'path': (
+        "SELECT ST_AsMVTGeom(ST_Transform(lines.geom, 3857), bounds.geom, {extent}) AS geom, "
+        "lines.path_id, lines.date::text AS date "
+        "FROM (SELECT p.path_id, p.date, "
+        "ST_MakeLine(ST_SetSRID(ST_MakePoint(p.lon::float8, p.lat::float8), {srid}) "
+        "ORDER BY split_part(p.idx, '-', 2)::int) AS geom "
+        "FROM {path} p WHERE TRUE {date_filter} GROUP BY p.path_id, p.date) lines, bounds "
+        "WHERE lines.geom && ST_Transform(bounds.geom, {srid})"
+    ),
+    'trajectory': (
+        # points are collapsed per grid cell, the tile size then depends on the area covered and not on the history
+        "SELECT ST_SnapToGrid(points.geom, {grid}) AS geom, min(points.idx) AS idx, min(points.timestamp) AS timestamp, "
+        "min(points.date) AS date, max(points.mowed_grass) AS mowed_grass, count(*) AS points "
+        "FROM ("
+        # the point expression matches the trajectory_point_idx index, see sql/script.sql
+        "SELECT ST_AsMVTGeom(ST_Transform(ST_SetSRID(ST_MakePoint(p.longitude::float8, p.latitude::float8), {srid}), 3857), "
+        "bounds.geom, {extent}) AS geom, "
+        "p.idx, p.timestamp, p.date::text AS date, p.mowed_grass "
+        "FROM {trajectory} p, bounds "
+        "WHERE ST_SetSRID(ST_MakePoint(p.longitude::float8, p.latitude::float8), {srid}) "
+        "&& ST_Transform(bounds.geom, {srid}) {date_filter}"
+        ") points "
+        "WHERE points.geom IS NOT NULL "
+        "GROUP BY 1 "
+        "LIMIT {max_points}"
+    )
+}
+
+# the column the optional date filter applies to, per layer
+DATE_COLUMNS = {'area': 'a.date', 'path': 'p.date', 'trajectory': 'p.date'}
+
+
+def is_valid_tile(z: int, x: int, y: int):
+    """ checks that the tile coordinates exist at their zoom level """
+    return MIN_ZOOM <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def get_tile(schema: str, layer: str, z: int, x: int, y: int, dates=None):
+    """
+    Returns one vector tile of a layer, rendered by PostGIS and cached until its tables change.
+
+    Args:
+        schema: Schema of the interface tables.
+        layer: One of LAYER_TABLES.
+        z, x, y: Tile coordinates in the web mercator tiling scheme.
+        dates: Optional list of 'YYYY-MM-DD' strings to restrict the rows to.
+
+    Returns:
+        tuple: The encoded tile as bytes and a version string usable as etag.
+    """
+    if layer not in LAYER_TABLES:
+        raise ValueError('unknown layer ' + layer)
+    if not is_valid_tile(z, x, y):
+        raise ValueError('tile {}/{}/{} does not exist'.format(z, x, y))
+
+    dates = tuple(sorted(dates)) if dates else ()
+    if layer == 'trajectory' and z < TRAJECTORY_MIN_ZOOM:
+        return b'', '{}-z{}'.format(layer, TRAJECTORY_MIN_ZOOM)
+    versions = tuple(db.table_version(schema, table) for table in LAYER_TABLES[layer])
+    key = (schema, layer, z, x, y, dates)
+    etag = '{}-{}'.format(layer, '-'.join(str(v) for v in versions))
+
+    with LOCK:
+        cached = TILE_CACHE.get(key)
+        if cached is not None and cached[0] == versions:
+            TILE_CACHE.move_to_end(key)
+            return cached[1], etag
+
+    tile = render_tile(schema, layer, z, x, y, dates)
+
+    with LOCK:
+        TILE_CACHE[key] = (versions, tile)
+        TILE_CACHE.move_to_end(key)
+        while len(TILE_CACHE) > TILE_CACHE_SIZE:
+            TILE_CACHE.popitem(last=False)
+    return tile, etag
+
+
+def render_tile(schema, layer, z, x, y, dates):
+    """ renders a tile with ST_AsMVT """
+    identifiers = {table: sql.Identifier(schema, table) for table in ['area', 'geo', 'path', 'trajectory']}
+    date_filter = sql.SQL("AND " + DATE_COLUMNS[layer] + " IN %s") if dates else sql.SQL("")
+    features = sql.SQL(LAYER_QUERIES[layer]).format(
+        extent=sql.Literal(EXTENT),
+        srid=sql.Literal(db.SRID),
+        grid=sql.Literal(TRAJECTORY_GRID),
+        max_points=sql.Literal(TRAJECTORY_MAX_POINTS),
+        date_filter=date_filter,
+        **identifiers
+    )
+    query = sql.SQL("WITH bounds AS (SELECT ST_TileEnvelope(%s, %s, %s) AS geom), " +
+                    "features AS ({}) " +
+                    "SELECT ST_AsMVT(features.*, %s, {}, 'geom') FROM features;").format(
+                        features,
+                        sql.Literal(EXTENT)
+                    )
+    values = (z, x, y) + ((dates,) if dates else ()) + (layer,)
+
+    with db.init_cursor() as haix:
+        haix.execute(query, values)
+        result = haix.fetchone()[0]
+    return bytes(result) if result is not None else b''
@@ -0,0 +1,110 @@
+"""
+Vectorized distances on the WGS84 ellipsoid.
+
+All functions take latitude and longitude in degrees as scalars or NumPy arrays and
+broadcast like NumPy operations, so whole paths are measured without a Python loop.
+"""
+import numpy as np
+
+# WGS84 ellipsoid
+EARTH_A_KM = 6378.137
+EARTH_F = 1 / 298.257223563
+EARTH_B_KM = EARTH_A_KM * (1 - EARTH_F)
+# mean earth radius used by the spherical approximation
+EARTH_RADIUS_KM = 6371.0088
+
+VINCENTY_MAX_ITER = 200
+VINCENTY_TOLERANCE = 1e-12
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """ great circle distance in km on a sphere, within about 0.5 % of the ellipsoidal distance """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+def vincenty_km(lat1, lon1, lat2, lon2):
+    """
+    Ellipsoidal distance in km with Vincenty's inverse formula, accurate to below a millimetre.
+
+    Nearly antipodal points, for which the iteration does not converge, fall back to the
+    haversine distance.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (lat1, lon1, lat2, lon2)))
+
+    u1 = np.arctan((1 - EARTH_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - EARTH_F) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+    lon_diff = np.radians(lon2 - lon1)
+
+    lam = lon_diff.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(VINCENTY_MAX_ITER):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cos_u2 * sin_lam) ** 2 + (cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam) ** 2)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # points on the equator have no defined cos(2 sigma_m)
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            c = EARTH_F / 16 * cos2_alpha * (4 + EARTH_F * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = lon_diff + (1 - c) * EARTH_F * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam - lam_prev) < VINCENTY_TOLERANCE
+            if converged.all():
+                break
+
+        u_sq = cos2_alpha * (EARTH_A_KM ** 2 - EARTH_B_KM ** 2) / EARTH_B_KM ** 2
+        a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = b * sin_sigma * (cos_2sigma_m + b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2) -
+            b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        distance = EARTH_B_KM * a * (sigma - delta_sigma)
+
+    distance = np.where(sin_sigma == 0, 0.0, distance)
+    if not converged.all():
+        distance = np.where(converged, distance, haversine_km(lat1, lon1, lat2, lon2))
+    return distance
+
+
+def segment_lengths_km(lats, lons, method=vincenty_km):
+    """ returns the length of every segment between consecutive points, one shorter than the input """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if len(lats) < 2:
+        return np.zeros(0)
+    return method(lats[:-1], lons[:-1], lats[1:], lons[1:])
+
+
+def path_length_km(lats, lons, method=vincenty_km):
+    """ returns the total length of a path through the points in their given order """
+    return float(segment_lengths_km(lats, lons, method).sum())
+
+
+def path_lengths_km(path_ids, lats, lons, method=vincenty_km):
+    """
+    Measures several paths at once.
+
+    Args:
+        path_ids: Path id of every point, the points of one path must be consecutive and in order.
+        lats, lons: Coordinates of the points in degrees.
+        method: Distance function, vincenty_km or haversine_km.
+
+    Returns:
+        dict: Length in km per path id.
+    """
+    path_ids = np.asarray(path_ids)
+    if len(path_ids) == 0:
+        return {}
+    segments = segment_lengths_km(lats, lons, method)
+    # segments between the last point of one path and the first of the next do not count
+    segments = np.where(path_ids[:-1] == path_ids[1:], segments, 0.0)
+    starts = np.flatnonzero(np.r_[True, path_ids[1:] != path_ids[:-1]])
+    totals = np.add.reduceat(np.r_[segments, 0.0], starts)
+    return {path_id: float(total) for path_id, total in zip(path_ids[starts], totals)}
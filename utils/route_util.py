@@ -15,30 +15,22 @@ def format_image_names(img_files, id):
     new_files = [file.filename for file in img_files]
     return ';'.join(new_files)
 
-def add_path_to_db(line, date):
-    id_data = db.get_max_id(var.SCHEMA, var.PATH) + 1
+def add_paths_to_db(lines, date):
+    """ saves all polylines of one date as new paths in a single transaction """
+    path_ids = db.reserve_ids(var.SCHEMA, var.PATH, len(lines))
 
-    point = 0
-    point_data = str(id_data) + "-" + str(point)
-    for points in line:
-        values = {
-            'path_id': id_data,
-            'idx': point_data,
-            'lat': float(points[0]),
-            'lon': float(points[1]),
-            'date': date
-        }
-        db.add_row(var.SCHEMA, var.PATH, values)
-        point = point + 1
-        point_data = str(id_data) + "-" + str(point)
+    rows = []
+    for id_data, line in zip(path_ids, lines):
+        for point, points in enumerate(line):
+            point_data = str(id_data) + "-" + str(point)
+            rows.append((id_data, point_data, float(points[0]), float(points[1]), date))
+    db.add_rows(var.SCHEMA, var.PATH, ['path_id', 'idx', 'lat', 'lon', 'date'], rows)
 
 def create_base_map(date):
     haix = db.open_table(var.SCHEMA, var.AREA, var.AREA_COLS)
     df = haix[haix['date'] == date]
 
-    db.convert_to_geojson_file(var.SCHEMA, var.GEO, var.GEO_FILE)
-    with open(var.GEO_FILE, 'r') as file:
-        geojson = json.load(file)
+    geojson = db.get_geojson_dict(var.SCHEMA, var.GEO)
 
     fig = px.choropleth_mapbox(
             df, geojson=geojson, color="type",
@@ -0,0 +1,88 @@
+"""
+Process-wide cache of the trajectory table, partitioned by date.
+
+Every date is loaded once and kept as its own DataFrame. The least recently used dates
+are evicted once the cache grows over its memory budget, and everything is dropped
+when the trajectory table is written to (see database.table_version).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils import variables as var
+from utils.database import database as db
+
+# memory budget of the cache in bytes
+MEMORY_BUDGET = int(os.environ.get('HAIX_TRAJ_CACHE_MB', 256)) * 1024 * 1024
+
+TRAJ_DTYPES = {
+    'idx': 'int64',
+    'timestamp': 'int64',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'date': 'str',
+    'mowed_grass': 'float64'
+}
+
+PARTITIONS = OrderedDict()
+STATE = {'version': None, 'size': 0}
+LOCK = threading.Lock()
+
+
+def get_day(date: str):
+    """
+    Returns all trajectory rows of one date, ordered by idx.
+
+    The DataFrame is shared between all callers and must not be modified.
+
+    Args:
+        date: The date as 'YYYY-MM-DD' string.
+
+    Returns:
+        DataFrame: The rows with the columns of var.TRAJ_COLS.
+    """
+    version = db.table_version(var.SCHEMA, var.traj)
+    with LOCK:
+        _check_version(version)
+        if date in PARTITIONS:
+            PARTITIONS.move_to_end(date)
+            return PARTITIONS[date]['df']
+
+    df = _load_day(date)
+
+    with LOCK:
+        # a write during the load makes the result outdated, return it but do not keep it
+        if version == db.table_version(var.SCHEMA, var.traj):
+            _check_version(version)
+            _store(date, df)
+    return df
+
+
+def _check_version(version):
+    if STATE['version'] != version:
+        PARTITIONS.clear()
+        STATE['size'] = 0
+        STATE['version'] = version
+
+
+def _store(date, df):
+    size = int(df.memory_usage(index=True, deep=True).sum())
+    if size > MEMORY_BUDGET:
+        return
+    if date in PARTITIONS:
+        STATE['size'] -= PARTITIONS.pop(date)['size']
+    while PARTITIONS and STATE['size'] + size > MEMORY_BUDGET:
+        _, evicted = PARTITIONS.popitem(last=False)
+        STATE['size'] -= evicted['size']
+    PARTITIONS[date] = {'df': df, 'size': size}
+    STATE['size'] += size
+
+
+def _load_day(date):
+    # streamed straight into column arrays, numeric columns arrive as Decimal objects otherwise
+    columns = db.open_table_columns(var.SCHEMA, var.traj, var.TRAJ_COLS, filter=('date', (date,)), dtypes=TRAJ_DTYPES)
+    df = pd.DataFrame(columns, columns=var.TRAJ_COLS)
+    df['mowed_grass'] = df['mowed_grass'].round().astype('Int64')
+    return df
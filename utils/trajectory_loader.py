@@ -0,0 +1,64 @@
+"""
+Loads Seekuh mission files into the trajectory table.
+
+A mission file is a csv with the columns Timestamp, Latitude, Longitude and Mowed_Grass,
+named after the mission date like data/Seekuh/maschsee-2024-07-15.
+
+Usage (from the repository root):
+    python -m utils.trajectory_loader data/Seekuh/maschsee-2024-08-15
+"""
+import argparse
+import os
+import re
+
+import pandas as pd
+
+from utils import variables as var
+from utils.database import database as db
+
+# idx is left out, the table's sequence fills it
+TRAJ_INSERT_COLS = ['timestamp', 'latitude', 'longitude', 'date', 'mowed_grass']
+
+
+def date_from_file_name(file_path: str):
+    """ returns the 'YYYY-MM-DD' date contained in the name of a mission file """
+    match = re.search(r'\d{4}-\d{2}-\d{2}', os.path.basename(file_path))
+    if match is None:
+        raise ValueError('no date found in file name ' + file_path)
+    return match.group(0)
+
+
+def load_mission(file_path: str, date: str = None):
+    """
+    Stores all rows of a mission file in interface.trajectory in one transaction.
+
+    The partition of the mission date is created first, so the rows land in their own partition.
+    Rows already stored for the date are replaced in the same transaction, so loading a file
+    again does not duplicate its day.
+
+    Args:
+        file_path: Path of the mission csv file.
+        date: Mission date as 'YYYY-MM-DD', taken from the file name if not given.
+
+    Returns:
+        int: The number of stored rows.
+    """
+    date = date if date is not None else date_from_file_name(file_path)
+    data = pd.read_csv(file_path)
+
+    db.ensure_trajectory_partitions(var.SCHEMA, [date])
+
+    mowed_grass = data['Mowed_Grass'] if 'Mowed_Grass' in data.columns else pd.Series(None, index=data.index)
+    rows = []
+    for timestamp, lat, lon, mowed in zip(data['Timestamp'], data['Latitude'], data['Longitude'], mowed_grass):
+        rows.append((int(timestamp), float(lat), float(lon), date, None if pd.isna(mowed) else int(mowed)))
+    return db.add_rows(var.SCHEMA, var.traj, TRAJ_INSERT_COLS, rows, replace=('date', [date]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load Seekuh mission files into the trajectory table.')
+    parser.add_argument('files', nargs='+', help='mission csv files, named after their date')
+    args = parser.parse_args()
+
+    for file_path in args.files:
+        print('[Traj] {}: {} rows'.format(file_path, load_mission(file_path)))
@@ -0,0 +1,106 @@
+"""
+Zoom dependent level of detail for the trajectory layer of the map.
+
+A mission day has tens of thousands of points, far more than can be told apart when the
+map is zoomed out. For every day a few simplified versions are built once with
+Largest-Triangle-Three-Buckets (LTTB) over timestamp and mowed_grass, which keeps the
+points where the mowed amount changes, and the map gets the version matching its zoom.
+"""
+import threading
+
+import numpy as np
+
+from utils import variables as var, trajectory_cache
+from utils.database import database as db
+
+# (highest zoom, maximum number of points) per level, zoom levels above the last one get every point
+LOD_LEVELS = [
+    (12, 1500),
+    (14, 4000),
+    (15, 10000)
+]
+FULL_LEVEL = len(LOD_LEVELS)
+
+SIMPLIFIED = {}
+STATE = {'version': None}
+LOCK = threading.Lock()
+
+
+def level_for_zoom(zoom: float):
+    """ returns the level of detail for a map zoom """
+    for level, (max_zoom, _) in enumerate(LOD_LEVELS):
+        if zoom <= max_zoom:
+            return level
+    return FULL_LEVEL
+
+
+def get_day(date: str, level: int):
+    """
+    Returns the trajectory rows of a date at a level of detail.
+
+    The DataFrame is shared between all callers and must not be modified.
+
+    Args:
+        date: The date as 'YYYY-MM-DD' string.
+        level: Level of detail, see level_for_zoom.
+
+    Returns:
+        DataFrame: The selected rows with the columns of var.TRAJ_COLS, in their original order.
+    """
+    df = trajectory_cache.get_day(date)
+    if level is None or level >= FULL_LEVEL:
+        return df
+
+    version = db.table_version(var.SCHEMA, var.traj)
+    with LOCK:
+        if STATE['version'] != version:
+            SIMPLIFIED.clear()
+            STATE['version'] = version
+        levels = SIMPLIFIED.get(date)
+
+    if levels is None:
+        levels = simplify_day(df)
+        with LOCK:
+            if STATE['version'] == version:
+                SIMPLIFIED[date] = levels
+    return levels[level]
+
+
+def simplify_day(df):
+    """ builds the simplified versions of a day for all levels at once """
+    x = df['timestamp'].to_numpy(dtype=float)
+    y = df['mowed_grass'].fillna(0).to_numpy(dtype=float)
+    return [df.iloc[lttb_indices(x, y, max_points)] for _, max_points in LOD_LEVELS]
+
+
+def lttb_indices(x, y, n_out: int):
+    """
+    Selects n_out points of a series with Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept, every bucket in between contributes the point that
+    spans the largest triangle with the previously selected point and the mean of the next bucket.
+
+    Returns:
+        ndarray: Indices of the selected points, ascending.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
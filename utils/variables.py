@@ -7,7 +7,6 @@ IMG_PATH = 'static/img/'
 DATA_FILE = 'data/data.csv'
 PATH_FILE = 'data/path.csv'
 TRAJ_PATH = 'data/Seekuh/'
-GEO_FILE = 'data/geo.json'
 VID_DATA_PATH = 'data/video_info/'
 VID_FILE_PATH = 'static/video/'
 neutral = 'neutral'
@@ -25,8 +24,11 @@ VIDEO_RGB = 'RGB'
 VIDEO_IR = 'IR'
 VIDEO_FILE_NAME_RGB = 'color_full.mp4'
 VIDEO_FILE_NAME_IR = 'infra1_full.mp4'
+VIDEO_HLS_NAME_RGB = 'color.m3u8'
+VIDEO_HLS_NAME_IR = 'infra1.m3u8'
 VIDEO_TIME_RGB_FILE_NAME = '_color.csv'
 VIDEO_TIME_IR_FILE_NAME = '_infra1.csv'
+VIDEO_ALIGNMENT_FILE_NAME = '_alignment.csv'
 SAVE = 'save'
 DELETE = 'delete'
 AREA = 'area'
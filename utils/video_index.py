@@ -0,0 +1,158 @@
+"""
+In-memory index of the video info files in data/video_info, used to sync map and videos.
+
+Each file is read once into NumPy arrays sorted by Timestamp and answers lookups with
+binary search. A file is read again as soon as its modification time or size changes,
+e.g. after video_util rewrote it.
+
+The files are written in recording order by video_util, so VideoTime grows with Timestamp
+and both columns can be searched on the same order.
+
+The RGB and IR videos are synced through an alignment table with the IR playback time of
+every RGB frame. video_util writes it next to the camera files, without it the table is
+computed from the two camera files once per file version.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import variables as var
+
+TABLES = {}
+ALIGNMENTS = {}
+LOCK = threading.Lock()
+
+
+def segment_file(date: str):
+    """ path of the info file with one row per recorded video segment """
+    return var.VID_DATA_PATH + var.maschsee + date + ".csv"
+
+
+def camera_file(date: str, video_name: str):
+    """ path of the per image info file of a camera, video_name is e.g. var.VIDEO_TIME_RGB_FILE_NAME """
+    return var.VID_DATA_PATH + var.maschsee + date + video_name
+
+
+def alignment_file(date: str):
+    """ path of the RGB to IR alignment file written by video_util """
+    return var.VID_DATA_PATH + var.maschsee + date + var.VIDEO_ALIGNMENT_FILE_NAME
+
+
+def get_table(path: str):
+    """
+    Returns the columns of an info file as dict of NumPy arrays sorted by Timestamp.
+
+    Returns:
+        dict: Column name to array, None if the file does not exist or is empty.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    file_key = (stat.st_mtime_ns, stat.st_size)
+
+    with LOCK:
+        cached = TABLES.get(path)
+    if cached is not None and cached[0] == file_key:
+        return cached[1]
+
+    df = pd.read_csv(path)
+    if len(df) == 0:
+        table = None
+    else:
+        df = df.sort_values('Timestamp', kind='stable')
+        table = {column: df[column].to_numpy() for column in df.columns}
+
+    with LOCK:
+        TABLES[path] = (file_key, table)
+    return table
+
+
+def first_row(table: dict, column: str, value: float, strict: bool = False):
+    """ index of the first row with column >= value, or > value if strict, len(table) if there is none """
+    return int(np.searchsorted(table[column], value, side='right' if strict else 'left'))
+
+
+def segment_at(date: str, timestamp: float):
+    """
+    Returns the video segment recorded at a timestamp as
+    [index, first_lat, first_lon, last_lat, last_lon], 0 without segment info.
+    """
+    table = get_table(segment_file(date))
+    if table is None:
+        return 0
+    # the segment started before the first one starting at or after the timestamp
+    index = min(max(first_row(table, 'Timestamp', timestamp) - 1, 0), len(table['Timestamp']) - 1)
+    return [index] + [float(table[column][index]) for column in ('first_lat', 'first_lon', 'last_lat', 'last_lon')]
+
+
+def video_time_at(date: str, video_name: str, timestamp: float):
+    """ returns the playback time of a camera video one second before a timestamp, 0 without video info """
+    table = get_table(camera_file(date, video_name))
+    if table is None:
+        return 0
+    index = min(first_row(table, 'Timestamp', timestamp, strict=True), len(table['Timestamp']) - 1)
+    return max(float(table['VideoTime'][index]) - 1, 0)
+
+
+def position_at_video_time(date: str, video_name: str, video_time: float):
+    """ returns latitude and longitude shown at a playback time of a camera video, None without video info """
+    table = get_table(camera_file(date, video_name))
+    if table is None:
+        return None
+    index = first_row(table, 'VideoTime', video_time)
+    if index == len(table['VideoTime']):
+        return None
+    return float(table['Latitude'][index]), float(table['Longitude'][index])
+
+
+def get_alignment(date: str):
+    """
+    Returns the alignment of a date as dict with the arrays Timestamp, VideoTime and IrVideoTime,
+    one entry per RGB frame. IrVideoTime is NaN for frames after the end of the IR video.
+
+    Returns:
+        dict: The alignment, None if the date has no RGB or no IR video info.
+    """
+    table = get_table(alignment_file(date))
+    if table is not None:
+        return table
+
+    rgb = get_table(camera_file(date, var.VIDEO_TIME_RGB_FILE_NAME))
+    ir = get_table(camera_file(date, var.VIDEO_TIME_IR_FILE_NAME))
+    if rgb is None or ir is None:
+        return None
+
+    # the loaded tables are replaced when their files change, so they identify the file versions
+    with LOCK:
+        cached = ALIGNMENTS.get(date)
+    if cached is not None and cached[0] is rgb and cached[1] is ir:
+        return cached[2]
+
+    table = align(rgb, ir)
+    with LOCK:
+        ALIGNMENTS[date] = (rgb, ir, table)
+    return table
+
+
+def align(rgb: dict, ir: dict):
+    """ assigns every RGB frame the IR frame of the first IR image at or after its timestamp """
+    index = np.searchsorted(ir['Timestamp'], rgb['Timestamp'], side='left')
+    found = index < len(ir['Timestamp'])
+    ir_time = np.full(len(index), np.nan)
+    ir_time[found] = ir['VideoTime'][index[found]]
+    return {'Timestamp': rgb['Timestamp'], 'VideoTime': rgb['VideoTime'], 'IrVideoTime': ir_time}
+
+
+def ir_time_at_rgb_time(date: str, rgb_time: float):
+    """ returns the IR playback time showing the same moment as an RGB playback time, None if there is none """
+    table = get_alignment(date)
+    if table is None:
+        return None
+    index = first_row(table, 'VideoTime', rgb_time)
+    if index == len(table['VideoTime']) or np.isnan(table['IrVideoTime'][index]):
+        return None
+    return float(table['IrVideoTime'][index])
+
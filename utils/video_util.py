@@ -1,6 +1,12 @@
 import os
 import sys
+import argparse
 import datetime
+import hashlib
+import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import numpy as np
@@ -10,12 +16,40 @@ from tqdm import tqdm
 import ffmpeg
 import glob
 
+FRAMERATE = 20
+# fixed distance between keyframes, every HLS segment starts with one and lasts this long
+GOP_SECONDS = 2
+GOP_FRAMES = FRAMERATE * GOP_SECONDS
+# number of ffmpeg encodes running at the same time, each of them uses several cores itself
+ENCODE_WORKERS = int(os.environ.get("HAIX_VIDEO_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+# frames per independently encoded segment of a full video, 5 minutes, a multiple of GOP_FRAMES
+SEGMENT_FRAMES = int(os.environ.get("HAIX_VIDEO_SEGMENT_FRAMES", 20 * 60 * 5))
+# frames read ahead from disk per encode
+PREFETCH_FRAMES = 64
+READ_WORKERS = 4
+CAMERAS = ["color", "infra1"]
+
+# libyaml's C loader parses the fix files several times faster, the pure Python loader is the fallback
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+# recording folders whose fix files are read at the same time
+SCAN_WORKERS = 8
+FIX_INDEX_COLUMNS = ["folder", "mtime", "fix_count", "first_lat", "first_lon", "last_lat", "last_lon"]
+
+# extracted recordings are read from DATA_PATH/DATE/files_extracted/, results are written to OUT_PATH/maschsee-DATE/
+PATHS = {
+    "data": os.environ.get("HAIX_VIDEO_DATA_PATH", "/home/ubuntu/haixInterface/videoData/"),
+    "out": os.environ.get("HAIX_VIDEO_OUT_PATH", "/home/ubuntu/haixInterface/videoDataOut/")
+}
+# records the finished steps of a date with a fingerprint of their inputs, see is_done
+MANIFEST_NAME = "manifest.json"
+MANIFEST_LOCK = threading.Lock()
+
 
 def create_videos(chosen_date: str):
     oberpfad = "../../../haix_server/" + chosen_date + "/bag_files_extracted/color/"
     ordners = [ordner for ordner in os.listdir(oberpfad)]
 
-    for ordner in tqdm(ordners):
+    def encode_folder(ordner):
         index = ordner.split("_")[7]
 
         path = oberpfad + ordner
@@ -23,92 +57,317 @@ def create_videos(chosen_date: str):
         try:
             (
                 ffmpeg
-                .input(path + '/*.png', pattern_type='glob', framerate=20)
+                .input(path + '/*.png', pattern_type='glob', framerate=FRAMERATE)
                 .output('../static/video/maschsee-' + chosen_date + '/movie' + index + '.mp4', pix_fmt='yuv420p', loglevel="quiet")
                 .run()
             )
         except ffmpeg.Error as e:
             print(ordner)
             print(e.stdout)
+            raise
+
+    # the folders are independent videos, so they are encoded side by side
+    with ThreadPoolExecutor(max_workers=ENCODE_WORKERS) as pool:
+        try:
+            list(tqdm(pool.map(encode_folder, ordners), total=len(ordners)))
+        except ffmpeg.Error:
             sys.exit(1)
 
 
 def create_video_info(chosen_date: str):
     path = "../../../haix_server/" + chosen_date + "/bag_files_extracted/color/"
 
-    dates = []
-    for x in tqdm(os.listdir(path)):
-        yaml_files = [yaml_file for yaml_file in os.listdir(path + x) if
-                      yaml_file.endswith(".yaml")]
-
-        with open(path + x + "/fix_00000.yaml") as stream:
-            try:
-                data = yaml.safe_load(stream)
-
-                first_lat = data['GPS']['lat']
-                first_lon = data['GPS']['long']
-            except yaml.YAMLError as exc:
-                print(exc)
-
-        if len(yaml_files) - 1 >= 1000:
-            file_name = "/fix_0" + str(len(yaml_files) - 1)
-        elif len(yaml_files) - 1 >= 100:
-            file_name = "/fix_00" + str(len(yaml_files) - 1)
-        else:
-            file_name = "/fix_000" + str(len(yaml_files) - 1)
-
-        with open(path + x + file_name + ".yaml") as stream:
-            try:
-                data = yaml.safe_load(stream)
-
-                last_lat = data['GPS']['lat']
-                last_lon = data['GPS']['long']
-            except yaml.YAMLError as exc:
-                print(exc)
+    fixes = load_fix_index(chosen_date, path)
 
+    dates = []
+    for row in fixes.itertuples(index=False):
+        x = row.folder
         mystamp = datetime.datetime(int(x.split("_")[1]), int(x.split("_")[2]), int(x.split("_")[3]),
                                     int(x.split("_")[4]) + 2, int(x.split("_")[5]), int(x.split("_")[6]))
-        dates.append([mystamp.timestamp(), x, first_lat, first_lon, last_lat, last_lon])
+        dates.append([mystamp.timestamp(), x, row.first_lat, row.first_lon, row.last_lat, row.last_lon])
 
     dates.sort()
     pd.DataFrame(dates, columns=["Timestamp", "filename", "first_lat", "first_lon", "last_lat", "last_lon"]).to_csv(
         "../data/video_info/maschsee-" + chosen_date + ".csv", index=False)
-            
 
-def create_full_video(chosen_date: str, camera: str = "color"):
-    output_path = "/home/ubuntu/haixInterface/videoDataOut/maschsee-" + chosen_date + "/" + camera + "_full.mp4"
-    folder_path = "/home/ubuntu/haixInterface/videoData/" + chosen_date + "/files_extracted/"
+
+def fix_index_path(chosen_date: str):
+    return "../data/video_info/maschsee-" + chosen_date + "_fixes.parquet"
+
+
+def load_fix_index(chosen_date: str, path: str):
+    """
+    Returns the first and last GPS fix of every recording folder of a date, one row per folder.
+
+    The fixes are kept in a Parquet index next to the video info, the YAML files are only parsed
+    for folders that are new or whose files changed since the index was written.
+    """
+    index_path = fix_index_path(chosen_date)
+    previous = pd.read_parquet(index_path) if os.path.exists(index_path) else pd.DataFrame(columns=FIX_INDEX_COLUMNS)
+    known = {row["folder"]: row for row in previous.to_dict("records")}
+
+    folders = sorted(entry.name for entry in os.scandir(path) if entry.is_dir())
+
+    def scan(folder):
+        # adding or removing fix files changes the modification time of the folder
+        mtime = os.stat(path + folder).st_mtime_ns
+        row = known.get(folder)
+        if row is not None and row["mtime"] == mtime:
+            return row
+        return read_folder_fixes(path + folder, folder, mtime)
+
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        rows = list(tqdm(pool.map(scan, folders), total=len(folders)))
+
+    index = pd.DataFrame(rows, columns=FIX_INDEX_COLUMNS)
+    if len(rows) != len(previous) or any(row is not known.get(row["folder"]) for row in rows):
+        index.to_parquet(index_path, index=False)
+    return index
+
+
+def read_folder_fixes(folder_path: str, folder: str, mtime: int):
+    fix_files = sorted(entry.name for entry in os.scandir(folder_path) if
+                       entry.name.startswith("fix_") and entry.name.endswith(".yaml"))
+    if len(fix_files) == 0:
+        print("[Warning] No fix files found in: ", folder)
+        first = last = (np.nan, np.nan)
+    else:
+        # the file names are zero padded, so the last one in order is the last fix of the recording
+        first = read_fix(folder_path + "/" + fix_files[0])
+        last = read_fix(folder_path + "/" + fix_files[-1])
+
+    return {
+        "folder": folder,
+        "mtime": mtime,
+        "fix_count": len(fix_files),
+        "first_lat": first[0],
+        "first_lon": first[1],
+        "last_lat": last[0],
+        "last_lon": last[1]
+    }
+
+
+def read_fix(file_path: str):
+    with open(file_path) as stream:
+        try:
+            data = yaml.load(stream, Loader=YAML_LOADER)
+            return data['GPS']['lat'], data['GPS']['long']
+        except yaml.YAMLError as exc:
+            print(exc)
+            return np.nan, np.nan
+
+
+def input_folder(chosen_date: str):
+    return os.path.join(PATHS["data"], chosen_date, "files_extracted") + "/"
+
+
+def output_folder(chosen_date: str):
+    return os.path.join(PATHS["out"], "maschsee-" + chosen_date) + "/"
+
+
+def load_manifest(chosen_date: str):
+    path = output_folder(chosen_date) + MANIFEST_NAME
+    if not os.path.exists(path):
+        return {"date": chosen_date, "steps": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(chosen_date: str, manifest: dict):
+    # written to a temporary file first, an interrupted run never leaves a broken manifest
+    path = output_folder(chosen_date) + MANIFEST_NAME
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def fingerprint(paths: list):
+    # changes when a file is added, removed, resized or rewritten
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update("{}|{}|{}\n".format(path, stat.st_size, stat.st_mtime_ns).encode())
+    return digest.hexdigest()
+
+
+def is_done(manifest: dict, step: str, inputs: str, output_path: str):
+    # a step is done when it already ran on the same inputs and its output still exists
+    with MANIFEST_LOCK:
+        done = manifest["steps"].get(step) == inputs
+    return done and os.path.exists(output_path)
+
+
+def mark_done(chosen_date: str, manifest: dict, step: str, inputs: str):
+    with MANIFEST_LOCK:
+        manifest["steps"][step] = inputs
+        save_manifest(chosen_date, manifest)
+
+
+def process_date(chosen_date: str, cameras: list = CAMERAS, hls: bool = False, force: bool = False):
+    """
+    Builds videos, video info and alignment of a date, skipping every step whose inputs did not change.
+
+    Interrupted runs continue where they stopped, new frames of a date only re-encode the
+    segments they fall into.
+    """
+    os.makedirs(output_folder(chosen_date), exist_ok=True)
+    manifest = {"date": chosen_date, "steps": {}} if force else load_manifest(chosen_date)
+
+    def process_camera(camera):
+        create_full_video(chosen_date, camera, manifest)
+        create_full_video_info(chosen_date, camera, manifest)
+        if hls:
+            create_hls_stream(chosen_date, camera, manifest)
+
+    # the cameras are processed concurrently, each of them encodes its segments in parallel as well
+    with ThreadPoolExecutor(max_workers=len(cameras)) as pool:
+        for future in [pool.submit(process_camera, camera) for camera in cameras]:
+            future.result()
+
+    if "color" in cameras and "infra1" in cameras:
+        create_video_alignment(chosen_date, manifest)
+
+
+def create_full_video(chosen_date: str, camera: str = "color", manifest: dict = None):
+    output_path = output_folder(chosen_date) + camera + "_full.mp4"
+    folder_path = input_folder(chosen_date)
+    manifest = manifest if manifest is not None else load_manifest(chosen_date)
 
     camera_folder = 'camera_' + camera
 
     camera_images = get_video_image_path_list(folder_path, camera_folder)
 
     print("[Vid] Creating full video with info for camera: ", camera)
+    if len(camera_images) == 0:
+        print("[Vid] No images found for camera: ", camera)
+        return
+
+    segments = [camera_images[i:i + SEGMENT_FRAMES] for i in range(0, len(camera_images), SEGMENT_FRAMES)]
+    segment_inputs = [fingerprint(images) for images in segments]
+    video_inputs = hashlib.sha1("".join(segment_inputs).encode()).hexdigest()
+    if is_done(manifest, camera + "/video", video_inputs, output_path):
+        print("[Vid] Full video is up to date for camera: ", camera)
+        return
+
+    # segments are kept between runs, only the ones with new or changed frames are encoded again
+    segment_folder = output_folder(chosen_date) + "." + camera + "_segments/"
+    os.makedirs(segment_folder, exist_ok=True)
+    segment_paths = [segment_folder + "segment_{:05d}.mp4".format(i) for i in range(len(segments))]
+
+    def create_segment(i):
+        step = camera + "/segment_{:05d}".format(i)
+        if not is_done(manifest, step, segment_inputs[i], segment_paths[i]):
+            encode_segment(segments[i], segment_paths[i])
+            mark_done(chosen_date, manifest, step, segment_inputs[i])
 
     try:
-        process = (
+        with ThreadPoolExecutor(max_workers=ENCODE_WORKERS) as pool:
+            futures = [pool.submit(create_segment, i) for i in range(len(segments))]
+            for future in tqdm(futures):
+                future.result()
+
+        concat_segments(segment_paths, output_path)
+    except ffmpeg.Error as e:
+        print(e.stdout.decode('utf-8'))
+        print(e.stderr.decode('utf-8'))
+        sys.exit(1)
+
+    mark_done(chosen_date, manifest, camera + "/video", video_inputs)
+
+
+def encode_segment(images: list, output_path: str):
+    process = (
+        ffmpeg
+        .input('pipe:', format='image2pipe', framerate=FRAMERATE)
+        .output(output_path, pix_fmt='yuv420p', g=GOP_FRAMES, keyint_min=GOP_FRAMES, sc_threshold=0, loglevel="error")
+        .overwrite_output()
+        .run_async(pipe_stdin=True, pipe_stderr=True)
+    )
+
+    write_frames(process.stdin, images)
+
+    process.stdin.close()
+    error = process.stderr.read()
+    process.wait()
+    if process.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', b'', error)
+
+
+def write_frames(stream, images: list):
+    # reads up to PREFETCH_FRAMES images ahead on a small pool while ffmpeg encodes, keeping their order
+    def read_image(image):
+        with open(image, 'rb') as f:
+            return f.read()
+
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        pending = deque()
+        for image in images:
+            pending.append(pool.submit(read_image, image))
+            if len(pending) >= PREFETCH_FRAMES:
+                stream.write(pending.popleft().result())
+        while pending:
+            stream.write(pending.popleft().result())
+
+
+def concat_segments(segment_paths: list, output_path: str):
+    # the segments share codec and parameters, so the concat demuxer joins them without re-encoding
+    list_path = os.path.join(os.path.dirname(segment_paths[0]), "segments.txt")
+    with open(list_path, 'w') as f:
+        for path in segment_paths:
+            # entries are resolved relative to the list, which sits next to the segments, quotes are escaped for the demuxer
+            f.write("file '" + os.path.basename(path).replace("'", "'\\''") + "'\n")
+
+    (
+        ffmpeg
+        .input(list_path, format='concat', safe=0)
+        .output(output_path, c='copy', loglevel="error")
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+
+
+def create_hls_stream(chosen_date: str, camera: str = "color", manifest: dict = None):
+    # the full video already has a keyframe every GOP_SECONDS, so it is only cut into HLS segments without re-encoding
+    folder = output_folder(chosen_date)
+    playlist_path = folder + camera + ".m3u8"
+    manifest = manifest if manifest is not None else load_manifest(chosen_date)
+
+    inputs = fingerprint([folder + camera + "_full.mp4"])
+    if is_done(manifest, camera + "/hls", inputs, playlist_path):
+        print("[Vid] HLS stream is up to date for camera: ", camera)
+        return
+
+    print("[Vid] Creating HLS stream for camera: ", camera)
+
+    try:
+        (
             ffmpeg
-            .input('pipe:', format='image2pipe', framerate=20)
-            .output(output_path, pix_fmt='yuv420p', loglevel="quiet")
+            .input(folder + camera + "_full.mp4")
+            .output(
+                playlist_path,
+                c='copy',
+                f='hls',
+                hls_time=GOP_SECONDS,
+                hls_playlist_type='vod',
+                hls_flags='independent_segments',
+                hls_segment_filename=folder + camera + "_%05d.ts",
+                loglevel="error"
+            )
             .overwrite_output()
-            .run_async(pipe_stdin=True)
+            .run(capture_stdout=True, capture_stderr=True)
         )
-
-        for img in tqdm(camera_images):
-            with open(img, 'rb') as f:
-                process.stdin.write(f.read())
-
-        process.stdin.close()
-        process.wait()
     except ffmpeg.Error as e:
         print(e.stdout.decode('utf-8'))
         print(e.stderr.decode('utf-8'))
         sys.exit(1)
 
+    mark_done(chosen_date, manifest, camera + "/hls", inputs)
+
 
-def create_full_video_info(chosen_date: str, camera: str = "color"):
-    folder_path = "/home/ubuntu/haixInterface/videoData/" + chosen_date + "/files_extracted/"
-    output_path = "/home/ubuntu/haixInterface/videoDataOut/maschsee-" + chosen_date + '/maschsee-' + chosen_date + "_" + camera + ".csv"
+def create_full_video_info(chosen_date: str, camera: str = "color", manifest: dict = None):
+    folder_path = input_folder(chosen_date)
+    output_path = output_folder(chosen_date) + 'maschsee-' + chosen_date + "_" + camera + ".csv"
+    manifest = manifest if manifest is not None else load_manifest(chosen_date)
 
     camera_folder = 'camera_' + camera
 
@@ -117,6 +376,11 @@ def create_full_video_info(chosen_date: str, camera: str = "color"):
     csv_files = glob.glob(folder_path + "**/*.csv", recursive=True)
     csv_files.sort()
 
+    inputs = fingerprint(images + csv_files)
+    if is_done(manifest, camera + "/info", inputs, output_path):
+        print("[Info] Video info is up to date for camera: ", camera)
+        return
+
     print("[Info] Creating full video info for camera: ", camera)
     print("[Info] Reading csv files")
     # create one pd dataframe from all csv files
@@ -128,34 +392,96 @@ def create_full_video_info(chosen_date: str, camera: str = "color"):
 
     print("[Info] Creating video info")
 
-    video_info = []
-    imageNumber = 0
     tolerance = 0.5 # seconds (+/-) image every second
 
-    for image in tqdm(images):
-        # get timestamp from image name
-        timestamp = float(image.split("_")[-1].split(".")[0])
-
-        # get video time
-        video_time = round(imageNumber * (1 / 20), 2)
-        imageNumber += 1
-
-        lat_mean = full_pd.loc[(full_pd["timestamp"] >= timestamp - tolerance) & (full_pd["timestamp"] <= timestamp + tolerance), "latitude"].mean()
-        lon_mean = full_pd.loc[(full_pd["timestamp"] >= timestamp - tolerance) & (full_pd["timestamp"] <= timestamp + tolerance), "longitude"].mean()
-
-        if np.isnan(lat_mean) or np.isnan(lon_mean):
-            print("[Warning] No GPS data found for timestamp: ", timestamp, "Using nearest timestamp instead")
-            # find nearest timestamp
-            nearest_timestamp = full_pd.loc[(full_pd["timestamp"] - timestamp).abs().argsort()[:1], "timestamp"].values[0]
-            lat_mean = full_pd.loc[full_pd["timestamp"] == nearest_timestamp, "latitude"].values[0]
-            lon_mean = full_pd.loc[full_pd["timestamp"] == nearest_timestamp, "longitude"].values[0]
-
-        video_info.append([timestamp, lat_mean, lon_mean, video_time])
+    # get timestamp from image name
+    image_times = np.array([float(image.split("_")[-1].split(".")[0]) for image in images])
+    # get video time
+    video_times = np.round(np.arange(len(images)) * (1 / FRAMERATE), 2)
 
+    lat_mean, lon_mean = align_gps_to_images(full_pd, image_times, tolerance)
 
-    video_info_df = pd.DataFrame(video_info, columns=["Timestamp", "Latitude", "Longitude", "VideoTime"])
+    video_info_df = pd.DataFrame({
+        "Timestamp": image_times,
+        "Latitude": lat_mean,
+        "Longitude": lon_mean,
+        "VideoTime": video_times
+    })
 
     video_info_df.to_csv(output_path, index=False)
+    mark_done(chosen_date, manifest, camera + "/info", inputs)
+
+
+def align_gps_to_images(gps: pd.DataFrame, image_times: np.ndarray, tolerance: float):
+    """
+    Returns the mean latitude and longitude of the GPS rows within +/- tolerance seconds of every image.
+
+    The GPS rows are sorted once and every window is found with a binary search, the means come
+    from cumulative sums. Images without GPS data in their window get the values of the row with
+    the nearest timestamp instead.
+    """
+    gps = gps[gps["timestamp"].notna()].sort_values("timestamp", kind="stable")
+    gps_times = gps["timestamp"].to_numpy(dtype=float)
+    if len(gps_times) == 0:
+        print("[Warning] No GPS data found")
+        return np.full(len(image_times), np.nan), np.full(len(image_times), np.nan)
+
+    start = np.searchsorted(gps_times, image_times - tolerance, side="left")
+    end = np.searchsorted(gps_times, image_times + tolerance, side="right")
+
+    means = []
+    for column in ["latitude", "longitude"]:
+        values = gps[column].to_numpy(dtype=float)
+        valid = ~np.isnan(values)
+        # values relative to the first one keep the cumulative sums precise on long missions
+        reference = values[valid][0] if valid.any() else 0.0
+        sums = np.r_[0.0, np.cumsum(np.where(valid, values - reference, 0.0))]
+        counts = np.r_[0, np.cumsum(valid)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means.append((sums[end] - sums[start]) / (counts[end] - counts[start]) + reference)
+    lat_mean, lon_mean = means
+
+    missing = np.isnan(lat_mean) | np.isnan(lon_mean)
+    if missing.any():
+        print("[Warning] No GPS data found for", int(missing.sum()), "images. Using nearest timestamp instead")
+        # find nearest timestamp, the earlier one on ties
+        after = np.clip(np.searchsorted(gps_times, image_times[missing], side="left"), 0, len(gps_times) - 1)
+        before = np.clip(after - 1, 0, len(gps_times) - 1)
+        nearest = np.where(
+            np.abs(gps_times[before] - image_times[missing]) <= np.abs(gps_times[after] - image_times[missing]),
+            before, after)
+        # first GPS row with that timestamp
+        nearest = np.searchsorted(gps_times, gps_times[nearest], side="left")
+        lat_mean[missing] = gps["latitude"].to_numpy(dtype=float)[nearest]
+        lon_mean[missing] = gps["longitude"].to_numpy(dtype=float)[nearest]
+
+    return lat_mean, lon_mean
+
+
+def create_video_alignment(chosen_date: str, manifest: dict = None):
+    # the dashboard syncs the IR video to the RGB video with this table instead of searching both camera files
+    prefix = output_folder(chosen_date) + "maschsee-" + chosen_date
+    manifest = manifest if manifest is not None else load_manifest(chosen_date)
+
+    inputs = fingerprint([prefix + "_color.csv", prefix + "_infra1.csv"])
+    if is_done(manifest, "alignment", inputs, prefix + "_alignment.csv"):
+        print("[Info] Video alignment is up to date")
+        return
+
+    rgb = pd.read_csv(prefix + "_color.csv").sort_values("Timestamp", kind="stable")
+    ir = pd.read_csv(prefix + "_infra1.csv").sort_values("Timestamp", kind="stable")
+
+    print("[Info] Creating video alignment")
+    # first IR image at or after the timestamp of every RGB image
+    alignment = pd.merge_asof(
+        rgb[["Timestamp", "VideoTime"]],
+        ir[["Timestamp", "VideoTime"]].rename(columns={"VideoTime": "IrVideoTime"}),
+        on="Timestamp",
+        direction="forward"
+    )
+
+    alignment.to_csv(prefix + "_alignment.csv", index=False)
+    mark_done(chosen_date, manifest, "alignment", inputs)
 
 
 def get_video_image_path_list(folder_path: str, camera_folder: str):
@@ -170,4 +496,16 @@ def get_video_image_path_list(folder_path: str, camera_folder: str):
 
 
 if __name__ == "__main__":
-    create_full_video('2024-08-15', 'infra1')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Builds the mission videos and video info of one or more dates.")
+    parser.add_argument("dates", nargs="+", help="dates as YYYY-MM-DD")
+    parser.add_argument("--cameras", nargs="+", default=CAMERAS, choices=CAMERAS)
+    parser.add_argument("--hls", action="store_true", help="also write HLS streams for the dashboard")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and rebuild everything")
+    parser.add_argument("--data-path", default=PATHS["data"], help="folder with DATE/files_extracted/")
+    parser.add_argument("--out-path", default=PATHS["out"], help="folder the maschsee-DATE/ results are written to")
+    args = parser.parse_args()
+
+    PATHS["data"] = args.data_path
+    PATHS["out"] = args.out_path
+    for date in args.dates:
+        process_date(date, args.cameras, hls=args.hls, force=args.force)
\ No newline at end of file